@@ -0,0 +1,277 @@
+"""
+Backends de inferência do classificador.
+
+- torch: pipeline do Hugging Face em fp32 (padrão).
+- onnx: modelo exportado para ONNX, executado com ONNX Runtime.
+- onnx-int8: modelo ONNX com quantização dinâmica int8 dos pesos.
+
+Todos os backends são chamáveis como o pipeline: recebem uma lista de textos e
+retornam uma lista de {'label': ..., 'score': ...}, na mesma ordem. predict_ids
+faz o mesmo a partir de ids já tokenizados (tokenization.py), sem tokenizar de novo.
+
+Exportar, quantizar e verificar a equivalência com o PyTorch:
+    python backends.py export --quantize --verify examples/
+"""
+import argparse
+import glob
+import inspect
+import json
+import os
+
+DEFAULT_MODEL = "nlptown/bert-base-multilingual-uncased-sentiment"
+DEFAULT_ONNX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'onnx')
+ONNX_FILE = 'model.onnx'
+ONNX_INT8_FILE = 'model.int8.onnx'
+MAX_LENGTH = 512
+
+
+def pad_token_ids(tokenizer, id_lists, max_length=MAX_LENGTH):
+    """Entradas do modelo (arrays NumPy) a partir de ids sem tokens especiais: [CLS]/[SEP], padding e máscara"""
+    import numpy as np
+
+    budget = max_length - tokenizer.num_special_tokens_to_add()
+    sequences = [tokenizer.build_inputs_with_special_tokens([int(i) for i in ids[:budget]]) for ids in id_lists]
+    width = max(len(sequence) for sequence in sequences)
+    input_ids = np.full((len(sequences), width), tokenizer.pad_token_id or 0, dtype=np.int64)
+    attention_mask = np.zeros_like(input_ids)
+    for row, sequence in enumerate(sequences):
+        input_ids[row, :len(sequence)] = sequence
+        attention_mask[row, :len(sequence)] = 1
+
+    inputs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+    if 'token_type_ids' in tokenizer.model_input_names:
+        inputs['token_type_ids'] = np.zeros_like(input_ids)
+    return inputs
+
+
+def _top_labels(probabilities, id2label):
+    results = []
+    for row in probabilities:
+        best = int(row.argmax())
+        results.append({'label': id2label[best], 'score': float(row[best])})
+    return results
+
+
+class TorchBackend:
+    """Pipeline do Hugging Face (PyTorch, CPU)"""
+
+    name = 'torch'
+
+    def __init__(self, model_name=DEFAULT_MODEL):
+        from transformers import pipeline
+
+        self.pipeline = pipeline("text-classification", model=model_name, device=-1)
+        self.tokenizer = self.pipeline.tokenizer
+
+    def __call__(self, texts, batch_size=None, truncation=True):
+        return self.pipeline(texts, batch_size=batch_size or len(texts), truncation=truncation)
+
+    def probabilities(self, texts):
+        """Probabilidades de todas as classes (usado na verificação de equivalência)"""
+        import torch
+
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors='pt')
+        with torch.no_grad():
+            logits = self.pipeline.model(**encoded).logits
+        return torch.softmax(logits, dim=-1).numpy()
+
+    def predict_ids(self, id_lists):
+        """Classifica textos já tokenizados (listas de ids sem tokens especiais)"""
+        import torch
+
+        inputs = {name: torch.from_numpy(value) for name, value in pad_token_ids(self.tokenizer, id_lists).items()}
+        with torch.no_grad():
+            logits = self.pipeline.model(**inputs).logits
+        return _top_labels(torch.softmax(logits, dim=-1).numpy(), self.pipeline.model.config.id2label)
+
+
+class OnnxBackend:
+    """Modelo exportado para ONNX, executado com ONNX Runtime na CPU"""
+
+    def __init__(self, model_dir=DEFAULT_ONNX_DIR, quantized=False, threads=0):
+        import onnxruntime
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.name = 'onnx-int8' if quantized else 'onnx'
+        path = os.path.join(model_dir, ONNX_INT8_FILE if quantized else ONNX_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"Modelo ONNX não encontrado em {path}. Exporte com: python backends.py export"
+                + (" --quantize" if quantized else "")
+            )
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.id2label = AutoConfig.from_pretrained(model_dir).id2label
+
+    def probabilities(self, texts):
+        """Probabilidades de todas as classes para um lote de textos"""
+        import numpy as np
+
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=MAX_LENGTH, return_tensors='np')
+        return self._run({name: value.astype(np.int64) for name, value in encoded.items()})
+
+    def _run(self, inputs):
+        import numpy as np
+
+        logits = self.session.run(None, {name: value for name, value in inputs.items() if name in self.input_names})[0]
+        logits = logits - logits.max(axis=-1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def predict_ids(self, id_lists):
+        """Classifica textos já tokenizados (listas de ids sem tokens especiais)"""
+        return _top_labels(self._run(pad_token_ids(self.tokenizer, id_lists)), self.id2label)
+
+    def __call__(self, texts, batch_size=None, truncation=True):
+        results = []
+        batch_size = batch_size or len(texts)
+        for start in range(0, len(texts), batch_size):
+            results.extend(_top_labels(self.probabilities(texts[start:start + batch_size]), self.id2label))
+        return results
+
+
+def create_backend(name='torch', model_name=DEFAULT_MODEL, onnx_dir=DEFAULT_ONNX_DIR, threads=0):
+    """Cria o backend selecionado ('torch', 'onnx' ou 'onnx-int8')"""
+    if name in ('onnx', 'onnx-int8'):
+        try:
+            return OnnxBackend(onnx_dir, quantized=name == 'onnx-int8', threads=threads)
+        except Exception as e:
+            print(f"Aviso: backend '{name}' indisponível ({e}). Usando PyTorch.")
+    elif name != 'torch':
+        print(f"Aviso: backend de inferência desconhecido '{name}'. Usando PyTorch.")
+    return TorchBackend(model_name)
+
+
+def export_onnx(model_name=DEFAULT_MODEL, output_dir=DEFAULT_ONNX_DIR):
+    """Exporta o modelo para ONNX com eixos dinâmicos de lote e sequência"""
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+
+    sample = tokenizer(["Exemplo de email para exportação."], return_tensors='pt')
+    # As entradas são passadas por posição: seguir a ordem dos parâmetros de forward()
+    forward_parameters = list(inspect.signature(model.forward).parameters)
+    input_names = sorted(sample.keys(), key=forward_parameters.index)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['logits'] = {0: 'batch'}
+
+    # Versões recentes do torch usam o exportador dynamo por padrão (requer onnxscript);
+    # o exportador TorchScript basta para um modelo BERT com eixos dinâmicos
+    options = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        options['dynamo'] = False
+
+    path = os.path.join(output_dir, ONNX_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            path,
+            input_names=input_names,
+            output_names=['logits'],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **options
+        )
+
+    # Tokenizer e configuração (id2label) ficam junto do modelo exportado
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    return path
+
+
+def quantize_onnx(output_dir=DEFAULT_ONNX_DIR):
+    """Aplica quantização dinâmica int8 aos pesos do modelo ONNX"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = os.path.join(output_dir, ONNX_FILE)
+    target = os.path.join(output_dir, ONNX_INT8_FILE)
+    quantize_dynamic(source, target, weight_type=QuantType.QInt8)
+    return target
+
+
+def check_equivalence(reference, candidate, texts, batch_size=16):
+    """
+    Compara as saídas de dois backends sobre os mesmos textos.
+
+    Returns:
+        dict: concordância de rótulos e maior diferença absoluta entre probabilidades.
+    """
+    agreements = 0
+    max_diff = 0.0
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        expected = reference.probabilities(batch)
+        actual = candidate.probabilities(batch)
+        agreements += int((expected.argmax(axis=-1) == actual.argmax(axis=-1)).sum())
+        max_diff = max(max_diff, float(abs(expected - actual).max()))
+    return {
+        'backend': candidate.name,
+        'texts': len(texts),
+        'label_agreement': round(agreements / len(texts), 4) if texts else 1.0,
+        'max_abs_prob_diff': round(max_diff, 6)
+    }
+
+
+def load_texts(path):
+    """Lê os textos de verificação de um arquivo .txt/.jsonl ou de uma pasta de .txt"""
+    if os.path.isdir(path):
+        texts = []
+        for file_path in sorted(glob.glob(os.path.join(path, '*.txt'))):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                texts.append(f.read())
+        return texts
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            return [json.loads(line)['text'] for line in f if line.strip()]
+        return [f.read()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o classificador para ONNX e verifica a equivalência")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export = subparsers.add_parser('export', help='Exporta (e opcionalmente quantiza) o modelo')
+    export.add_argument('--model', default=DEFAULT_MODEL)
+    export.add_argument('--output', default=DEFAULT_ONNX_DIR)
+    export.add_argument('--quantize', action='store_true', help='Gera também o modelo int8')
+    export.add_argument('--verify', help='Textos para comparar com o PyTorch (.txt, .jsonl ou pasta)')
+
+    verify = subparsers.add_parser('verify', help='Compara modelos já exportados com o PyTorch')
+    verify.add_argument('texts', help='Textos para comparar (.txt, .jsonl ou pasta)')
+    verify.add_argument('--model', default=DEFAULT_MODEL)
+    verify.add_argument('--output', default=DEFAULT_ONNX_DIR)
+
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        print(f"Exportando {args.model} para {args.output}...")
+        print(f"✅ Modelo ONNX: {export_onnx(args.model, args.output)}")
+        if args.quantize:
+            print(f"✅ Modelo int8: {quantize_onnx(args.output)}")
+        texts_path = args.verify
+    else:
+        texts_path = args.texts
+
+    if texts_path:
+        texts = load_texts(texts_path)
+        reference = TorchBackend(args.model)
+        for quantized in (False, True):
+            if os.path.exists(os.path.join(args.output, ONNX_INT8_FILE if quantized else ONNX_FILE)):
+                candidate = OnnxBackend(args.output, quantized=quantized)
+                print(json.dumps(check_equivalence(reference, candidate, texts), ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+"""
+Classificação em massa de caixas de email pela linha de comando.
+
+Lê mbox, Maildir, pastas com arquivos .eml/.txt/.pdf ou JSONL em streaming e
+distribui os emails em lotes para um pool de processos. Cada processo carrega o
+classificador uma única vez. Os resultados são gravados no JSONL de saída à
+medida que ficam prontos; esse arquivo também é o checkpoint: com --resume, os
+emails já presentes nele são pulados.
+
+Uso:
+    python bulk.py caixa.mbox -o resultados.jsonl
+    python bulk.py ~/Maildir emails/ dados.jsonl -o resultados.jsonl --workers 8 --resume
+"""
+import argparse
+import email
+import email.policy
+import json
+import mailbox
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+FILE_EXTENSIONS = ('.eml', '.txt', '.pdf')
+_HTML_TAGS = re.compile(r'<[^>]+>')
+
+
+# Leitura das fontes ----------------------------------------------------------
+
+def detect_format(path):
+    """Detecta o formato da fonte: maildir, dir, jsonl, mbox ou file"""
+    if os.path.isdir(path):
+        if all(os.path.isdir(os.path.join(path, sub)) for sub in ('cur', 'new', 'tmp')):
+            return 'maildir'
+        return 'dir'
+    if path.endswith('.jsonl'):
+        return 'jsonl'
+    if path.endswith('.mbox'):
+        return 'mbox'
+    with open(path, 'rb') as f:
+        if f.read(5) == b'From ':
+            return 'mbox'
+    return 'file'
+
+
+def iter_tasks(path, source_format='auto', text_field=None, id_field=None):
+    """
+    Gera tarefas (id, tipo, conteúdo) sem carregar a fonte inteira em memória.
+    Tipos: 'text' (texto pronto), 'bytes' (mensagem RFC 822) ou 'path' (arquivo lido no worker).
+    """
+    source_format = detect_format(path) if source_format == 'auto' else source_format
+
+    if source_format == 'mbox':
+        box = mailbox.mbox(path, create=False)
+        for key in box.iterkeys():
+            yield f"{path}#{key}", 'bytes', box.get_bytes(key)
+
+    elif source_format == 'maildir':
+        box = mailbox.Maildir(path, factory=None, create=False)
+        for key in box.iterkeys():
+            yield f"{path}#{key}", 'bytes', box.get_bytes(key)
+
+    elif source_format == 'dir':
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(FILE_EXTENSIONS):
+                    file_path = os.path.join(root, name)
+                    yield file_path, 'path', file_path
+
+    elif source_format == 'jsonl':
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                item_id = record.get(id_field) if id_field else record.get('id', record.get('request_id'))
+                yield (
+                    f"{path}#{item_id if item_id is not None else line_number}",
+                    'text',
+                    record_text(record, text_field)
+                )
+
+    else:
+        yield path, 'path', path
+
+
+def record_text(record, text_field=None):
+    """Texto de um registro JSONL: o campo indicado, ou 'text', ou título + corpo"""
+    if text_field:
+        return record.get(text_field) or ''
+    if 'text' in record:
+        return record['text'] or ''
+    return '\n\n'.join(str(record[key]) for key in ('subject', 'title', 'body') if record.get(key))
+
+
+def message_to_text(raw):
+    """Assunto e corpo (texto puro, ou HTML sem tags) de uma mensagem RFC 822"""
+    message = email.message_from_bytes(raw, policy=email.policy.default)
+    parts = []
+    if message['subject']:
+        parts.append(str(message['subject']))
+
+    body = message.get_body(preferencelist=('plain', 'html'))
+    if body is not None:
+        try:
+            content = body.get_content()
+        except Exception:
+            content = body.get_payload(decode=True).decode('utf-8', errors='replace')
+        if body.get_content_type() == 'text/html':
+            content = _HTML_TAGS.sub(' ', content)
+        parts.append(content)
+    return '\n\n'.join(parts)
+
+
+# Workers ---------------------------------------------------------------------
+
+_app = None
+
+
+def _init_worker(threads):
+    """Carrega o classificador uma única vez por processo"""
+    global _app
+    os.environ['MODEL_LOADING'] = 'eager'
+    # Cada processo usa poucas threads do torch para não disputar os núcleos
+    os.environ.setdefault('OMP_NUM_THREADS', str(threads))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    import main
+    _app = main
+
+
+def _load_text(kind, payload):
+    if kind == 'text':
+        return payload
+    if kind == 'bytes':
+        return message_to_text(payload)
+
+    lower = payload.lower()
+    if lower.endswith('.eml'):
+        with open(payload, 'rb') as f:
+            return message_to_text(f.read())
+    if lower.endswith('.pdf'):
+        return _app.extract_text_from_pdf(payload)
+    with open(payload, 'r', encoding='utf-8', errors='replace') as f:
+        return f.read(_app.EXTRACT_MAX_CHARS)
+
+
+def _process_chunk(tasks, with_responses, with_triage=False):
+    """Classifica um lote de tarefas no worker; erros são registrados por item"""
+    records = []
+    texts = []
+    for item_id, kind, payload in tasks:
+        record = {'id': item_id}
+        try:
+            text = _load_text(kind, payload)
+            if not text or not text.strip():
+                record['error'] = 'Texto vazio'
+            else:
+                texts.append(text)
+        except Exception as e:
+            record['error'] = f'Erro ao ler: {str(e)}'
+        records.append(record)
+
+    valid = [record for record in records if 'error' not in record]
+    try:
+        classifications = _app.classify_emails_batch(texts)
+        responses = _app.generate_responses_batch(texts, [c.category for c in classifications]) if with_responses else None
+        for position, (record, classification) in enumerate(zip(valid, classifications)):
+            record.update({
+                'category': classification.category,
+                'confidence': round(classification.confidence * 100, 2),
+                'tier': classification.tier
+            })
+            if responses is not None:
+                record['response'] = responses[position]
+    except Exception as e:
+        for record in valid:
+            record['error'] = f'Erro ao classificar: {str(e)}'
+
+    if with_triage and texts:
+        # Vários emails por chamada à OpenAI, dentro do orçamento de tokens
+        from triagem import processar_triagem_lote
+
+        for record, triage in zip(valid, processar_triagem_lote(texts)):
+            record['triagem'] = triage
+
+    return records, os.getpid()
+
+
+# Execução --------------------------------------------------------------------
+
+def load_done_ids(output_path):
+    """IDs já gravados no arquivo de saída (checkpoint)"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                continue  # Linha incompleta de uma execução interrompida
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+
+def iter_chunks(tasks, size):
+    chunk = []
+    for task in tasks:
+        chunk.append(task)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(args):
+    done = load_done_ids(args.output) if args.resume else set()
+    if done:
+        print(f"Retomando: {len(done)} emails já processados em {args.output}", file=sys.stderr)
+
+    def pending_tasks():
+        for source in args.sources:
+            for task in iter_tasks(source, args.format, args.text_field, args.id_field):
+                if task[0] not in done:
+                    yield task
+
+    workers = args.workers or os.cpu_count() or 1
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    max_in_flight = workers * 2  # Limita a memória: poucos lotes lidos à frente
+
+    stats = Counter()
+    per_worker = Counter()
+    started = time.perf_counter()
+    last_report = started
+
+    with open(args.output, 'a' if args.resume else 'w', encoding='utf-8') as output, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        if args.resume and output.tell() > 0 and not _ends_with_newline(args.output):
+            # Execução anterior interrompida no meio de uma linha
+            output.write('\n')
+
+        chunks = iter_chunks(pending_tasks(), args.chunk_size)
+        in_flight = set()
+        exhausted = False
+
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < max_in_flight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                in_flight.add(pool.submit(_process_chunk, chunk, args.responses, args.triagem))
+
+            if not in_flight:
+                break
+
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                records, pid = future.result()
+                per_worker[pid] += len(records)
+                for record in records:
+                    output.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    stats['processed'] += 1
+                    stats['errors' if 'error' in record else record['category']] += 1
+                    if 'tier' in record:
+                        stats[f"tier:{record['tier']}"] += 1
+                output.flush()
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                last_report = now
+                print(f"{stats['processed']} emails | {stats['errors']} erros | "
+                      f"{stats['processed'] / (now - started):.1f} emails/s", file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'processed': stats['processed'],
+        'skipped': len(done),
+        'errors': stats['errors'],
+        'categories': {key: value for key, value in stats.items() if key in ('Produtivo', 'Improdutivo')},
+        'tiers': {key[5:]: value for key, value in stats.items() if key.startswith('tier:')},
+        'workers': workers,
+        'emails_per_worker': list(per_worker.values()),
+        'elapsed_seconds': round(elapsed, 2),
+        'emails_per_second': round(stats['processed'] / elapsed, 2) if elapsed else 0.0
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2), file=sys.stderr)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Classifica caixas de email inteiras em paralelo")
+    parser.add_argument('sources', nargs='+', help='mbox, Maildir, pasta com .eml/.txt/.pdf ou arquivo .jsonl')
+    parser.add_argument('-o', '--output', required=True, help='Arquivo JSONL de saída (também é o checkpoint)')
+    parser.add_argument('--format', default='auto', choices=['auto', 'mbox', 'maildir', 'dir', 'jsonl', 'file'])
+    parser.add_argument('--workers', type=int, default=0, help='Processos (padrão: todos os núcleos)')
+    parser.add_argument('--chunk-size', type=int, default=32, help='Emails por lote enviado a cada processo')
+    parser.add_argument('--responses', action='store_true', help='Gerar também a resposta sugerida')
+    parser.add_argument('--triagem', action='store_true', help='Triagem com a OpenAI, vários emails por chamada')
+    parser.add_argument('--resume', action='store_true', help='Pular emails já presentes no arquivo de saída')
+    parser.add_argument('--text-field', help='Campo de texto nos registros JSONL')
+    parser.add_argument('--id-field', help='Campo de identificação nos registros JSONL')
+    parser.add_argument('--report-every', type=float, default=10.0, help='Intervalo do relatório de progresso (s)')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Cache de resultados indexado pelo hash do texto normalizado.
+
+Dois backends estão disponíveis:
+- MemoryBackend: LRU em memória, por processo.
+- SQLiteBackend: persistente em disco; sobrevive a reinícios e é compartilhado
+  entre os workers do gunicorn que apontam para o mesmo arquivo.
+
+Ambos aplicam expiração por TTL e um limite de tamanho em bytes (chave e valor
+em UTF-8), removendo as entradas usadas há mais tempo quando o limite é
+excedido. No SQLite, os acessos que atualizam a ordem do LRU são acumulados e
+gravados em lote, em vez de uma escrita a cada acerto.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Normaliza o texto para que variações de espaços e maiúsculas gerem o mesmo hash"""
+    text = unicodedata.normalize('NFC', text)
+    return _WHITESPACE.sub(' ', text).strip().casefold()
+
+
+def content_hash(text, namespace=''):
+    """Hash SHA-256 do texto normalizado, separado por namespace (ex.: 'classify')"""
+    digest = hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+    return f"{namespace}:{digest}" if namespace else digest
+
+
+def entry_size(key, payload):
+    """Tamanho de uma entrada em bytes (UTF-8): os textos em português têm caracteres multibyte"""
+    return len(key.encode('utf-8')) + len(payload.encode('utf-8'))
+
+
+class MemoryBackend:
+    """LRU em memória com TTL e limite de entradas e de bytes"""
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # chave -> (expira_em, tamanho, valor serializado)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, payload):
+        size = entry_size(key, payload)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.time() + self.ttl, size, payload)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def info(self):
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._data), 'bytes': self._bytes}
+
+
+class SQLiteBackend:
+    """Cache persistente em SQLite (modo WAL), seguro para vários processos"""
+
+    def __init__(self, path, max_entries, max_bytes, ttl, touch_interval=60.0, touch_batch=256):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Precisão do LRU: acertos a menos de touch_interval do último acesso gravado
+        # não geram escrita; os demais são gravados em lotes de até touch_batch
+        self.touch_interval = touch_interval
+        self.touch_batch = touch_batch
+        self._local = threading.local()
+        self._touches = {}  # chave -> último acesso ainda não gravado
+        self._touches_flushed = time.time()
+        self._touches_lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _connect(self):
+        """Uma conexão por thread e por processo (conexões não sobrevivem ao fork)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, accessed_at FROM cache WHERE key = ? AND expires_at >= ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[1] >= self.touch_interval:
+            self._touch(conn, key, now)
+        return row[0]
+
+    def _touch(self, conn, key, now):
+        """Registra o acesso; grava o lote quando ele enche ou após touch_interval"""
+        with self._touches_lock:
+            self._touches[key] = now
+            if len(self._touches) < self.touch_batch and now - self._touches_flushed < self.touch_interval:
+                return
+            touches = self._take_touches(now)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._write_touches(conn, touches)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            # Apenas a ordem do LRU fica menos precisa
+            print(f"Erro ao gravar acessos do cache: {e}")
+
+    def _take_touches(self, now):
+        touches = self._touches
+        self._touches = {}
+        self._touches_flushed = now
+        return touches
+
+    @staticmethod
+    def _write_touches(conn, touches):
+        conn.executemany(
+            "UPDATE cache SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in touches.items()]
+        )
+
+    def set(self, key, payload):
+        size = entry_size(key, payload)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connect()
+        with self._touches_lock:
+            touches = self._take_touches(now)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Os acessos pendentes entram antes da remoção, que segue a ordem do LRU
+            self._write_touches(conn, touches)
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, payload, size, now + self.ttl, now)
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn, now):
+        """Remove entradas expiradas e, se preciso, as menos usadas recentemente"""
+        conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if entries <= self.max_entries and total <= self.max_bytes:
+            return
+
+        excess_bytes = total - self.max_bytes
+        excess_entries = entries - self.max_entries
+        removed_bytes = removed_entries = 0
+        doomed = []
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY accessed_at"):
+            if removed_bytes >= excess_bytes and removed_entries >= excess_entries:
+                break
+            doomed.append((key,))
+            removed_bytes += size
+            removed_entries += 1
+        conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
+
+    def info(self):
+        entries, total = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        return {'backend': 'sqlite', 'path': self.path, 'entries': entries, 'bytes': total}
+
+
+class ResultCache:
+    """Cache de valores serializáveis em JSON, com contadores de acertos e falhas"""
+
+    def __init__(self, max_entries=10000, max_bytes=64 * 1024 * 1024, ttl=86400, sqlite_path=None):
+        if sqlite_path:
+            self.backend = SQLiteBackend(sqlite_path, max_entries, max_bytes, ttl)
+        else:
+            self.backend = MemoryBackend(max_entries, max_bytes, ttl)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna o valor armazenado ou None"""
+        try:
+            payload = self.backend.get(key)
+        except Exception as e:
+            print(f"Erro ao ler do cache: {e}")
+            payload = None
+
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if payload is None else json.loads(payload)
+
+    def set(self, key, value):
+        """Armazena um valor serializável em JSON"""
+        try:
+            self.backend.set(key, json.dumps(value, ensure_ascii=False))
+        except Exception as e:
+            print(f"Erro ao gravar no cache: {e}")
+
+    def stats(self):
+        """Contadores deste processo e ocupação do backend"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        try:
+            info = self.backend.info()
+        except Exception as e:
+            info = {'error': str(e)}
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else 0.0,
+            **info
+        }
@@ -0,0 +1,99 @@
+"""
+Classificador em cascata.
+
+Os estágios (tiers) são executados do mais barato para o mais caro. Cada estágio
+retorna (categoria, confiança) ou None quando não tem evidência. Se a confiança
+atinge o limiar do estágio, a decisão é tomada ali e os estágios seguintes
+(ex.: o transformer) não são executados.
+"""
+import threading
+from collections import namedtuple
+
+CascadeResult = namedtuple('CascadeResult', ['category', 'confidence', 'tier'])
+
+
+class CascadeClassifier:
+    """Executa os estágios em ordem e registra qual estágio decidiu cada email"""
+
+    def __init__(self):
+        self.tiers = []
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def add_tier(self, name, classify_fn, threshold=0.0, batch_fn=None, enabled=None):
+        """
+        Adiciona um estágio ao final da cascata.
+
+        Args:
+            name (str): Nome do estágio, retornado em CascadeResult.tier.
+            classify_fn (callable): text -> (categoria, confiança) ou None.
+            threshold (float): Confiança mínima para o estágio decidir.
+            batch_fn (callable): lista de textos -> lista de resultados (opcional).
+            enabled (callable): Retorna False quando o estágio está indisponível (opcional).
+        """
+        self.tiers.append({
+            'name': name,
+            'classify': classify_fn,
+            'batch': batch_fn,
+            'threshold': threshold,
+            'enabled': enabled or (lambda: True)
+        })
+        self._counts.setdefault(name, 0)
+
+    def classify(self, text):
+        """Classifica um email, retornando CascadeResult"""
+        return self.classify_batch([text])[0]
+
+    def classify_batch(self, texts):
+        """Classifica uma lista de emails; cada estágio roda em lote sobre os pendentes"""
+        decided = [None] * len(texts)
+        best = [None] * len(texts)
+        pending = list(range(len(texts)))
+        active = [tier for tier in self.tiers if tier['enabled']()]
+
+        for position, tier in enumerate(active):
+            if not pending:
+                break
+
+            is_last = position == len(active) - 1
+            outputs = self._run_tier(tier, [texts[i] for i in pending])
+
+            still_pending = []
+            for i, output in zip(pending, outputs):
+                if output is None:
+                    still_pending.append(i)
+                    continue
+
+                result = CascadeResult(output[0], output[1], tier['name'])
+                if is_last or result.confidence >= tier['threshold']:
+                    decided[i] = result
+                else:
+                    if best[i] is None or result.confidence > best[i].confidence:
+                        best[i] = result
+                    still_pending.append(i)
+            pending = still_pending
+
+        # Nenhum estágio decidiu: usar o resultado mais confiante já calculado
+        for i in pending:
+            decided[i] = best[i] or CascadeResult("Produtivo", 0.5, 'default')
+
+        with self._lock:
+            for result in decided:
+                self._counts[result.tier] = self._counts.get(result.tier, 0) + 1
+
+        return decided
+
+    def _run_tier(self, tier, texts):
+        """Executa um estágio; em caso de erro ele se abstém e a cascata segue"""
+        try:
+            if tier['batch'] and len(texts) > 1:
+                return tier['batch'](texts)
+            return [tier['classify'](text) for text in texts]
+        except Exception as e:
+            print(f"Erro no estágio '{tier['name']}' da cascata: {e}")
+            return [None] * len(texts)
+
+    def stats(self):
+        """Quantidade de emails decididos por cada estágio"""
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,56 @@
+"""
+Inferência em janelas deslizantes para emails e PDFs longos.
+
+O transformer lê no máximo ~510 tokens; em um anexo longo o pedido real pode
+estar na terceira página. Os ids do email (tokenization.py) são divididos em
+janelas do tamanho do orçamento do modelo, sobrepostas em `overlap` tokens
+para que uma frase na fronteira apareça inteira em alguma janela. Todas as
+janelas de todos os emails vão juntas para o agendador de inferência, e as
+saídas de cada email são combinadas em um único resultado:
+
+- max: a janela mais confiante decide;
+- mean: média das confianças por rótulo entre as janelas;
+- first: como mean, mas a primeira janela (assunto e abertura) tem peso
+  `first_weight`.
+
+max_windows limita o custo de um PDF enorme: apenas as primeiras janelas são
+classificadas.
+"""
+from collections import defaultdict
+
+STRATEGIES = ('max', 'mean', 'first')
+
+
+def windows(ids, size, overlap=128, max_windows=8):
+    """
+    Janelas de até `size` ids, consecutivas com `overlap` ids em comum.
+
+    Retorna (janelas, truncado): truncado indica que o limite de max_windows
+    deixou o final do texto de fora.
+    """
+    if len(ids) <= size:
+        return [ids], False
+    step = max(1, size - min(overlap, size // 2))
+    chunks = []
+    for start in range(0, len(ids), step):
+        chunks.append(ids[start:start + size])
+        if start + size >= len(ids):
+            return chunks, False
+        if len(chunks) >= max_windows:
+            return chunks, True
+    return chunks, False
+
+
+def aggregate(results, strategy='max', first_weight=2.0):
+    """Combina as saídas {'label', 'score'} das janelas de um email em uma só"""
+    if len(results) == 1:
+        return results[0]
+    if strategy == 'max':
+        return max(results, key=lambda result: result['score'])
+
+    weights = [first_weight if strategy == 'first' and i == 0 else 1.0 for i in range(len(results))]
+    totals = defaultdict(float)
+    for weight, result in zip(weights, results):
+        totals[result['label']] += weight * result['score']
+    label = max(totals, key=totals.get)
+    return {'label': label, 'score': totals[label] / sum(weights)}
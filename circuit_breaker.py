@@ -0,0 +1,96 @@
+"""
+Circuit breaker para dependências externas (a OpenAI).
+
+- closed: as chamadas passam. Erros e chamadas mais lentas que o SLO de
+  latência contam como falhas; uma chamada rápida bem-sucedida zera a contagem.
+- open: após failure_threshold falhas consecutivas, as chamadas são recusadas
+  de imediato (quem chama usa o fallback) durante reset_timeout segundos.
+- half_open: passado esse tempo, até half_open_max_calls chamadas de teste são
+  liberadas. Um sucesso fecha o circuito; uma falha o abre novamente.
+
+Em um lote, cada chamada pede a sua liberação com allow(): com o circuito meio
+aberto só a chamada de teste sai, e as demais usam o fallback.
+"""
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Estado do circuito compartilhado pelas threads do processo"""
+
+    def __init__(self, failure_threshold=5, latency_slo=8.0, reset_timeout=30.0, half_open_max_calls=1):
+        self.failure_threshold = failure_threshold
+        self.latency_slo = latency_slo
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+        self.opened = 0
+        self.rejected = 0
+        self.slow_calls = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def allow(self):
+        """True se a chamada pode ser feita; cada chamada liberada deve terminar em record_success/record_failure"""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self, latency):
+        """Chamada concluída; acima do SLO de latência conta como falha"""
+        if self.latency_slo and latency > self.latency_slo:
+            with self._lock:
+                self.slow_calls += 1
+            self.record_failure()
+            return
+        with self._lock:
+            self._failures = 0
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                print("Circuito da OpenAI fechado: chamadas normalizadas")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            state = self._current_state()
+            if state == HALF_OPEN or (state == CLOSED and self._failures >= self.failure_threshold):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                print(f"Circuito da OpenAI aberto após {self._failures} falhas: usando templates por {self.reset_timeout:.0f}s")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+                'slow_calls': self.slow_calls,
+                'latency_slo_seconds': self.latency_slo
+            }
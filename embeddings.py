@@ -0,0 +1,289 @@
+"""
+Classificador semântico por protótipos (centroides de embeddings).
+
+Cada email é convertido em um vetor por um encoder de sentenças multilíngue
+pequeno (média dos estados do transformer, normalizada). Cada categoria é
+representada pelo centroide dos vetores de alguns emails de exemplo, então a
+classificação de um lote inteiro é uma única multiplicação de matrizes
+(emails x dimensão) @ (dimensão x categorias) com o NumPy.
+
+Para criar uma categoria basta adicionar uma pasta com emails de exemplo:
+    config/prototypes/
+        Produtivo/*.txt
+        Improdutivo/*.txt
+        Cobranca/*.txt      <- nova categoria
+
+Os centroides são gravados em um .npz junto com a assinatura dos exemplos e
+recalculados apenas quando os arquivos ou o encoder mudam. Os embeddings dos
+emails ficam em um cache LRU pelo hash do conteúdo: um email reavaliado não
+passa de novo pelo encoder.
+
+Pré-calcular os centroides e avaliar em um JSONL rotulado:
+    python embeddings.py build
+    python embeddings.py evaluate teste.jsonl
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from cache import content_hash
+
+DEFAULT_ENCODER = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+DEFAULT_PROTOTYPES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'prototypes')
+DEFAULT_CENTROIDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'prototypes.npz')
+MAX_LENGTH = 256
+MAX_CHARS = 5000
+
+
+class SentenceEncoder:
+    """Encoder de sentenças: média dos estados da última camada, ponderada pela máscara de atenção"""
+
+    def __init__(self, model_name=DEFAULT_ENCODER, batch_size=32, max_length=MAX_LENGTH):
+        from transformers import AutoModel, AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+
+    @property
+    def dimension(self):
+        return self.model.config.hidden_size
+
+    def encode(self, texts):
+        """Matriz float32 (len(texts) x dimensão) com linhas de norma 1"""
+        import torch
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = [text[:MAX_CHARS] for text in texts[start:start + self.batch_size]]
+            encoded = self.tokenizer(
+                batch, padding=True, truncation=True, max_length=self.max_length, return_tensors='pt'
+            )
+            with torch.no_grad():
+                hidden = self.model(**encoded).last_hidden_state
+            mask = encoded['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            vectors.append(pooled.numpy())
+
+        if not vectors:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return _normalize(np.vstack(vectors).astype(np.float32))
+
+
+class EmbeddingCache:
+    """LRU em memória de embeddings, indexado pelo hash do texto normalizado"""
+
+    def __init__(self, max_entries=20000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def set(self, key, vector):
+        with self._lock:
+            self._data[key] = vector
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'entries': len(self._data)
+            }
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def load_prototypes(directory):
+    """Lê {categoria: [textos]} de uma pasta por categoria com arquivos .txt"""
+    prototypes = {}
+    for category_dir in sorted(glob.glob(os.path.join(directory, '*'))):
+        if not os.path.isdir(category_dir):
+            continue
+        texts = []
+        for path in sorted(glob.glob(os.path.join(category_dir, '*.txt'))):
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read().strip()
+            if text:
+                texts.append(text)
+        if texts:
+            prototypes[os.path.basename(category_dir)] = texts
+    return prototypes
+
+
+def prototypes_signature(prototypes, model_name):
+    """Assinatura dos exemplos e do encoder: muda quando os centroides precisam ser recalculados"""
+    digest = hashlib.sha256(model_name.encode('utf-8'))
+    for category in sorted(prototypes):
+        digest.update(b'\0' + category.encode('utf-8'))
+        for text in prototypes[category]:
+            digest.update(b'\1' + content_hash(text).encode('ascii'))
+    return digest.hexdigest()
+
+
+class PrototypeClassifier:
+    """
+    Classificação pelo centroide mais próximo (similaridade de cosseno).
+
+    A confiança é o softmax das similaridades dividido pela temperatura: com
+    vetores normalizados as similaridades ficam próximas entre si, e uma
+    temperatura baixa separa as categorias.
+    """
+
+    def __init__(self, encoder, categories, centroids, temperature=0.05, cache=None):
+        self.encoder = encoder
+        self.categories = list(categories)
+        self.centroids = _normalize(np.asarray(centroids, dtype=np.float32))
+        self.temperature = temperature
+        self.cache = cache if cache is not None else EmbeddingCache()
+
+    @classmethod
+    def from_prototypes(cls, encoder, prototypes, **kwargs):
+        """Calcula os centroides a partir de {categoria: [textos]}"""
+        categories = sorted(prototypes)
+        if len(categories) < 2:
+            raise ValueError("São necessárias ao menos duas categorias com exemplos")
+        centroids = np.vstack([encoder.encode(prototypes[category]).mean(axis=0) for category in categories])
+        return cls(encoder, categories, centroids, **kwargs)
+
+    @classmethod
+    def load(cls, encoder, prototypes_dir=DEFAULT_PROTOTYPES_DIR, centroids_path=DEFAULT_CENTROIDS_PATH, **kwargs):
+        """
+        Usa os centroides gravados se a assinatura dos exemplos confere; senão
+        recalcula e tenta gravar (uma pasta somente leitura não impede a carga).
+        """
+        prototypes = load_prototypes(prototypes_dir)
+        signature = prototypes_signature(prototypes, encoder.model_name)
+
+        if centroids_path and os.path.exists(centroids_path):
+            with np.load(centroids_path, allow_pickle=False) as artifact:
+                if str(artifact['signature']) == signature:
+                    return cls(encoder, [str(c) for c in artifact['categories']], artifact['centroids'], **kwargs)
+
+        classifier = cls.from_prototypes(encoder, prototypes, **kwargs)
+        if centroids_path:
+            try:
+                classifier.save(centroids_path, signature)
+            except OSError as e:
+                print(f"Não foi possível gravar os centroides em {centroids_path}: {e}")
+        return classifier
+
+    def save(self, path, signature):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez(
+            tmp_path,
+            signature=np.array(signature),
+            model_name=np.array(self.encoder.model_name),
+            categories=np.array(self.categories),
+            centroids=self.centroids
+        )
+        os.replace(tmp_path, path)
+        return path
+
+    def embed(self, texts):
+        """Embeddings dos textos; apenas os ausentes do cache passam pelo encoder, em um único lote"""
+        keys = [content_hash(text, 'embedding') for text in texts]
+        vectors = [self.cache.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            encoded = self.encoder.encode([texts[i] for i in missing])
+            for i, vector in zip(missing, encoded):
+                vectors[i] = vector
+                self.cache.set(keys[i], vector)
+        if not vectors:
+            return np.zeros((0, self.centroids.shape[1]), dtype=np.float32)
+        return np.vstack(vectors)
+
+    def scores(self, texts):
+        """Similaridade de cosseno (textos x categorias)"""
+        return self.embed(texts) @ self.centroids.T
+
+    def classify_batch(self, texts):
+        """[(categoria, confiança)] para um lote, com uma única multiplicação de matrizes"""
+        similarities = self.scores(texts) / self.temperature
+        similarities -= similarities.max(axis=1, keepdims=True)
+        probabilities = np.exp(similarities)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return [
+            (self.categories[index], float(probabilities[row, index]))
+            for row, index in enumerate(best)
+        ]
+
+    def classify(self, text):
+        return self.classify_batch([text])[0]
+
+
+def main():
+    from linear_model import LABELS, load_labeled
+
+    parser = argparse.ArgumentParser(description="Classificador semântico por protótipos")
+    parser.add_argument('--encoder', default=os.getenv('EMBEDDING_MODEL', DEFAULT_ENCODER))
+    parser.add_argument('--prototypes', default=DEFAULT_PROTOTYPES_DIR, help='Pasta com uma subpasta por categoria')
+    parser.add_argument('--centroids', default=DEFAULT_CENTROIDS_PATH, help='Arquivo .npz dos centroides')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('build', help='Calcula e grava os centroides das categorias')
+
+    evaluate_parser = subparsers.add_parser('evaluate', help='Avalia em um JSONL rotulado (Produtivo/Improdutivo)')
+    evaluate_parser.add_argument('data')
+    evaluate_parser.add_argument('--text-field')
+    evaluate_parser.add_argument('--label-field')
+
+    args = parser.parse_args()
+    encoder = SentenceEncoder(args.encoder)
+
+    if args.command == 'build':
+        prototypes = load_prototypes(args.prototypes)
+        started = time.perf_counter()
+        classifier = PrototypeClassifier.from_prototypes(encoder, prototypes)
+        classifier.save(args.centroids, prototypes_signature(prototypes, encoder.model_name))
+        print(f"✅ {len(classifier.categories)} categorias em {time.perf_counter() - started:.1f}s: "
+              + ', '.join(f"{category} ({len(prototypes[category])} exemplos)" for category in classifier.categories))
+        print(f"💾 Centroides salvos em {args.centroids}")
+    else:
+        classifier = PrototypeClassifier.load(encoder, args.prototypes, args.centroids)
+        texts, labels = load_labeled(args.data, args.text_field, args.label_field)
+        started = time.perf_counter()
+        predictions = classifier.classify_batch(texts)
+        elapsed = time.perf_counter() - started
+        correct = sum(category == LABELS[int(label)] for (category, _), label in zip(predictions, labels))
+        print(json.dumps({
+            'samples': len(texts),
+            'accuracy': round(correct / len(texts), 4) if texts else 0.0,
+            'emails_per_second': round(len(texts) / elapsed, 1) if elapsed else 0.0
+        }, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Extração de texto em memória, página por página, com orçamento de caracteres.
+
+Os uploads são lidos diretamente do stream da requisição, sem passar pelo disco.
+A extração para assim que o orçamento de caracteres é atingido: como apenas o
+início do texto é usado pela classificação, as páginas restantes de PDFs grandes
+não são processadas. Falhas de leitura ou decodificação são registradas por
+página, sem interromper a extração das demais.
+"""
+import codecs
+import io
+from collections import namedtuple
+
+import PyPDF2
+
+ExtractionResult = namedtuple('ExtractionResult', ['text', 'pages_read', 'total_pages', 'truncated', 'errors'])
+
+# Tamanho dos blocos lidos de arquivos de texto
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class ExtractionError(Exception):
+    """O arquivo não pôde ser lido"""
+
+
+def open_pdf(stream):
+    """Abre o PDF e retorna suas páginas; cada página só é analisada quando acessada"""
+    try:
+        reader = PyPDF2.PdfReader(stream)
+        if reader.is_encrypted:
+            reader.decrypt('')
+        return reader.pages
+    except Exception as e:
+        raise ExtractionError(f"Erro ao ler PDF: {str(e)}")
+
+
+def iter_pdf_pages(pages):
+    """Gera (número da página, texto, erro) para cada página, sob demanda"""
+    for index in range(len(pages)):
+        try:
+            yield index + 1, pages[index].extract_text() or '', None
+        except Exception as e:
+            yield index + 1, '', str(e)
+
+
+def extract_pdf(stream, max_chars):
+    """Extrai o texto de um PDF até max_chars caracteres"""
+    pages = open_pdf(stream)
+    total_pages = len(pages)
+    parts = []
+    length = 0
+    errors = []
+    pages_read = 0
+    truncated = False
+
+    for page_number, text, error in iter_pdf_pages(pages):
+        pages_read = page_number
+        if error is not None:
+            errors.append({'page': page_number, 'error': error})
+            continue
+
+        remaining = max_chars - length
+        if len(text) > remaining:
+            parts.append(text[:remaining])
+            truncated = True
+            break
+        # O separador só entra se couber: uma página que preenche o orçamento não é truncada
+        part = (text + "\n")[:remaining]
+        parts.append(part)
+        length += len(part)
+        if length >= max_chars:
+            # Orçamento esgotado: há mais conteúdo se restarem páginas
+            break
+
+    truncated = truncated or pages_read < total_pages
+    return ExtractionResult(''.join(parts), pages_read, total_pages, truncated, errors)
+
+
+def extract_plain_text(stream, max_chars, encoding='utf-8'):
+    """
+    Decodifica um arquivo de texto em blocos até max_chars caracteres.
+    Bytes inválidos são substituídos e registrados como erro de decodificação.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    parts = []
+    length = 0
+    replaced = 0
+    truncated = False
+
+    while length < max_chars:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        final = not chunk
+        text = decoder.decode(chunk, final=final)
+        replaced += text.count('\ufffd')
+        if len(text) > max_chars - length:
+            text = text[:max_chars - length]
+            truncated = True
+        parts.append(text)
+        length += len(text)
+        if final:
+            break
+    else:
+        # Orçamento atingido exatamente: há mais conteúdo se o stream não terminou
+        truncated = truncated or bool(stream.read(1))
+
+    errors = []
+    if replaced:
+        errors.append({'page': 1, 'error': f"{replaced} caractere(s) inválido(s) em {encoding} substituído(s)"})
+    return ExtractionResult(''.join(parts), 1, 1, truncated, errors)
+
+
+def extract_text(stream, filename, max_chars):
+    """Extrai o texto de um upload (.pdf ou .txt) a partir de um stream em memória"""
+    if filename.lower().endswith('.pdf'):
+        # O PyPDF2 precisa de um stream com seek
+        if not stream.seekable():
+            stream = io.BytesIO(stream.read())
+        return extract_pdf(stream, max_chars)
+    return extract_plain_text(stream, max_chars)
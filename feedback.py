@@ -0,0 +1,42 @@
+"""
+Log durável das correções de classificação enviadas pelos operadores.
+
+Cada correção é uma linha JSON acrescentada ao arquivo com O_APPEND (seguro
+entre os workers do gunicorn) e sincronizada com o disco antes de a requisição
+responder. O log pode ser usado para retreinar o classificador linear:
+    python linear_model.py train rotulados.jsonl data/feedback.jsonl
+"""
+import json
+import os
+import threading
+import time
+
+
+class FeedbackLog:
+    """Arquivo JSONL somente de acréscimo"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.written = 0
+
+    def append(self, record):
+        """Grava a correção com data e hora; retorna o registro gravado"""
+        record = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), **record}
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            # Uma única escrita por linha: acréscimos de vários processos não se misturam
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self.written += 1
+        return record
+
+    def stats(self):
+        return {'path': self.path, 'written': self.written}
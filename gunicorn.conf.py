@@ -0,0 +1,80 @@
+"""
+Configuração de produção do gunicorn (carregada automaticamente de ./gunicorn.conf.py).
+
+    gunicorn main:app
+
+- preload_app: o processo mestre importa main.py e carrega os modelos uma única
+  vez (MODEL_LOADING=eager) antes de criar os workers. Os workers nascem por
+  fork e compartilham as páginas dos pesos por copy-on-write, em vez de cada um
+  carregar a sua cópia do BERT.
+- gc.freeze() antes de cada fork: os objetos já carregados saem do rastreamento
+  do coletor de lixo, que de outra forma escreveria nos seus cabeçalhos e
+  copiaria as páginas compartilhadas para cada worker.
+- Threads de inferência por worker: workers x threads do torch (ou do ONNX
+  Runtime) não passam do número de núcleos (TORCH_NUM_THREADS, padrão:
+  núcleos / workers), evitando que cada worker abra um pool do tamanho da
+  máquina inteira.
+- Worker gthread: as requisições concorrentes de um worker compartilham o
+  agendador de micro-batching e o cliente assíncrono da OpenAI.
+
+Threads, loops e conexões (agendador, cliente da OpenAI, SQLite) já são
+recriados sob demanda em cada worker após o fork. Os consumidores da fila de
+jobs iniciam em cada worker assim que a aplicação está carregada
+(post_worker_init), então a fila durável volta a andar após um reinício
+sem esperar a primeira requisição.
+
+Com INFERENCE_BACKEND=onnx/onnx-int8 o preload fica desligado por padrão: a
+sessão do ONNX Runtime cria o seu pool de threads ao ser construída, e esse
+pool não sobrevive ao fork. Nesse caso cada worker carrega o seu modelo.
+"""
+import gc
+import os
+import sys
+
+cpu_count = os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', min(2, cpu_count)))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+backlog = 2048
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '0' if os.getenv('INFERENCE_BACKEND', 'torch').startswith('onnx') else '1') == '1'
+if preload_app:
+    # Carga em segundo plano no mestre seria interrompida pelo fork: carregar antes
+    os.environ.setdefault('MODEL_LOADING', 'eager')
+
+
+def torch_threads(server):
+    """Threads do torch por worker: TORCH_NUM_THREADS ou os núcleos divididos entre os workers"""
+    return int(os.getenv('TORCH_NUM_THREADS', 0)) or max(1, cpu_count // max(1, server.cfg.workers))
+
+
+def when_ready(server):
+    server.log.info(f"Workers: {server.cfg.workers} x {server.cfg.threads} threads, "
+                    f"{torch_threads(server)} threads do torch cada (preload: {server.cfg.preload_app})")
+
+
+def pre_fork(server, worker):
+    if server.cfg.preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    count = torch_threads(server)
+    if 'torch' in sys.modules:
+        # Modelo carregado no mestre (preload)
+        sys.modules['torch'].set_num_threads(count)
+    # Sem preload, o torch e o ONNX Runtime são carregados depois, já dentro do worker
+    os.environ['OMP_NUM_THREADS'] = str(count)
+    os.environ.setdefault('INFERENCE_THREADS', str(count))
+
+
+def post_worker_init(worker):
+    # Chamado com a aplicação já carregada, com ou sem preload
+    app_module = sys.modules.get('main')
+    if app_module is not None:
+        app_module.start_job_workers()
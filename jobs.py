@@ -0,0 +1,355 @@
+"""
+Fila de jobs local e durável em SQLite, para uploads grandes e lotes.
+
+POST /api/jobs grava o job (e os arquivos enviados) e responde na hora com o
+id; um pool de threads em cada processo consome a fila e grava o resultado,
+consultado em GET /api/jobs/<id>. Não há broker externo: o arquivo SQLite (modo
+WAL) é compartilhado pelos workers do gunicorn e sobrevive a reinícios.
+
+- Prioridade: jobs de maior prioridade saem primeiro; no empate, os mais antigos.
+- Visibility timeout: ao ser retirado da fila, o job recebe um prazo
+  (lease), renovado periodicamente pelo pool enquanto o job executa. Se o
+  processo morrer no meio do trabalho, as renovações param, o prazo vence e o
+  job volta a ficar visível para outro worker. Cada retirada é identificada
+  pelo número da tentativa: quem perdeu o prazo não grava mais o resultado.
+- Tentativas: cada retirada conta uma tentativa. Um job que falha (ou cujo prazo
+  vence) volta à fila até max_attempts; depois disso fica como failed.
+- Jobs concluídos há mais de result_ttl segundos são apagados.
+
+O arquivo SQLite só é criado no primeiro enqueue: importar a aplicação (ou
+consultar a fila vazia) não toca o disco.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """Fila de jobs com prioridade e visibility timeout sobre SQLite"""
+
+    def __init__(self, path, visibility_timeout=300, max_attempts=3, result_ttl=7 * 24 * 60 * 60):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self._local = threading.local()
+        self._created = False
+        self._create_lock = threading.Lock()
+
+    def _create(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " payload TEXT NOT NULL,"
+            " priority INTEGER NOT NULL DEFAULT 0,"
+            " status TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL,"
+            " lease_expires_at REAL,"
+            " result TEXT,"
+            " error TEXT)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_files ("
+            " job_id TEXT NOT NULL,"
+            " position INTEGER NOT NULL,"
+            " filename TEXT NOT NULL,"
+            " data BLOB NOT NULL,"
+            " PRIMARY KEY (job_id, position))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority DESC, created_at)")
+
+    def _connect(self, create=False):
+        """
+        Uma conexão por thread e por processo (conexões não sobrevivem ao fork).
+        Sem create, retorna None enquanto o arquivo da fila não existe.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            if not self._created and not os.path.exists(self.path):
+                if not create:
+                    return None
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            if not self._created:
+                with self._create_lock:
+                    if not self._created:
+                        self._create(conn)
+                        self._created = True
+        return conn
+
+    def enqueue(self, kind, payload, files=(), priority=0):
+        """Grava o job e os arquivos [(nome, bytes)] em uma transação; retorna o id"""
+        job_id = uuid.uuid4().hex
+        conn = self._connect(create=True)
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO jobs (id, kind, payload, priority, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(payload, ensure_ascii=False), int(priority), QUEUED, time.time())
+            )
+            conn.executemany(
+                "INSERT INTO job_files (job_id, position, filename, data) VALUES (?, ?, ?, ?)",
+                [(job_id, position, filename, data) for position, (filename, data) in enumerate(files)]
+            )
+        return job_id
+
+    def claim(self):
+        """
+        Retira o próximo job visível (na fila, ou em execução com o prazo vencido)
+        e o marca como em execução até o fim do visibility timeout. Retorna
+        {'id', 'kind', 'payload', 'files', 'attempts'} ou None se a fila está vazia.
+        """
+        now = time.time()
+        conn = self._connect()
+        if conn is None:
+            return None
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Prazo vencido sem tentativas restantes: o job não volta mais para a fila
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, lease_expires_at = NULL,"
+                " error = 'Prazo de execução esgotado em todas as tentativas'"
+                " WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                (FAILED, now, RUNNING, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT id, kind, payload, attempts FROM jobs"
+                " WHERE status = ? OR (status = ? AND lease_expires_at < ?)"
+                " ORDER BY priority DESC, created_at LIMIT 1",
+                (QUEUED, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_expires_at = ?"
+                " WHERE id = ?",
+                (RUNNING, now, now + self.visibility_timeout, row['id'])
+            )
+        files = conn.execute(
+            "SELECT filename, data FROM job_files WHERE job_id = ? ORDER BY position", (row['id'],)
+        ).fetchall()
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'payload': json.loads(row['payload']),
+            'files': [(file['filename'], bytes(file['data'])) for file in files],
+            'attempts': row['attempts'] + 1
+        }
+
+    def extend_lease(self, job_id, attempt):
+        """Renova o prazo do job em execução; False se ele não pertence mais a esta tentativa"""
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (time.time() + self.visibility_timeout, job_id, RUNNING, attempt)
+            ).rowcount
+        return updated == 1
+
+    def complete(self, job_id, attempt, result):
+        """Grava o resultado, se o job ainda pertence a esta tentativa; os arquivos não são mais necessários"""
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = NULL, finished_at = ?, lease_expires_at = NULL"
+                " WHERE id = ? AND status = ? AND attempts = ?",
+                (DONE, json.dumps(result, ensure_ascii=False), time.time(), job_id, RUNNING, attempt)
+            ).rowcount
+            if updated:
+                conn.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+        return updated == 1
+
+    def fail(self, job_id, attempt, error):
+        """Devolve o job à fila, ou o marca como failed se as tentativas acabaram"""
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            updated = conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,"
+                " finished_at = CASE WHEN attempts >= ? THEN ? END,"
+                " error = ?, lease_expires_at = NULL WHERE id = ? AND status = ? AND attempts = ?",
+                (self.max_attempts, FAILED, QUEUED, self.max_attempts, time.time(), str(error),
+                 job_id, RUNNING, attempt)
+            ).rowcount
+        return updated == 1
+
+    def get(self, job_id):
+        """Estado e resultado do job, ou None se não existe"""
+        conn = self._connect()
+        if conn is None:
+            return None
+        row = conn.execute(
+            "SELECT id, kind, priority, status, attempts, created_at, started_at, finished_at, result, error"
+            " FROM jobs WHERE id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        return job
+
+    def purge(self):
+        """Apaga os jobs concluídos ou falhos há mais de result_ttl segundos"""
+        cutoff = time.time() - self.result_ttl
+        conn = self._connect()
+        if conn is None:
+            return 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM job_files WHERE job_id IN"
+                " (SELECT id FROM jobs WHERE status IN (?, ?) AND finished_at < ?)",
+                (DONE, FAILED, cutoff)
+            )
+            deleted = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff)
+            ).rowcount
+        return deleted
+
+    def stats(self):
+        counts = dict.fromkeys((QUEUED, RUNNING, DONE, FAILED), 0)
+        conn = self._connect()
+        if conn is None:
+            return counts
+        for status, count in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        return counts
+
+
+class JobWorkerPool:
+    """
+    Threads que consomem a fila e executam handler(job) -> resultado (JSON).
+
+    Uma thread de heartbeat renova, a cada terço do visibility timeout, o prazo
+    dos jobs em execução neste processo: um job mais longo que o timeout não é
+    retirado de novo por outro worker enquanto este processo estiver vivo.
+    """
+
+    def __init__(self, queue, handler, workers=2, poll_interval=1.0, purge_interval=3600):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._active = {}  # id -> tentativa dos jobs em execução neste processo
+        self._pid = None
+        self._last_purge = 0.0
+        self.processed = 0
+        self.failed = 0
+
+    def ensure_started(self):
+        """Inicia as threads na primeira utilização (e novamente após um fork)"""
+        if self._pid == os.getpid() or not self.workers:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Threads não sobrevivem ao fork
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._active = {}
+            self._threads = [
+                threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True))
+            for thread in self._threads:
+                thread.start()
+
+    def notify(self):
+        """Acorda as threads deste processo após um enqueue (as dos outros veem o job no próximo poll)"""
+        self.ensure_started()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                job = self.queue.claim()
+            except sqlite3.Error as e:
+                print(f"Erro ao ler a fila de jobs: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                self._maybe_purge()
+                continue
+
+            with self._lock:
+                self._active[job['id']] = job['attempts']
+            try:
+                result = self.handler(job)
+            except Exception as e:
+                print(f"Job {job['id']} falhou (tentativa {job['attempts']}): {e}")
+                self._finish(job, self.queue.fail, e)
+                with self._lock:
+                    self.failed += 1
+                continue
+            self._finish(job, self.queue.complete, result)
+            with self._lock:
+                self.processed += 1
+
+    def _finish(self, job, record, value):
+        with self._lock:
+            self._active.pop(job['id'], None)
+        try:
+            if not record(job['id'], job['attempts'], value):
+                print(f"Job {job['id']}: prazo perdido na tentativa {job['attempts']}, resultado descartado")
+        except sqlite3.Error as e:
+            # O prazo vence e o job é retirado de novo
+            print(f"Erro ao gravar o job {job['id']}: {e}")
+
+    def _heartbeat(self):
+        interval = max(0.05, self.queue.visibility_timeout / 3)
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                active = list(self._active.items())
+            for job_id, attempt in active:
+                try:
+                    self.queue.extend_lease(job_id, attempt)
+                except sqlite3.Error as e:
+                    print(f"Erro ao renovar o prazo do job {job_id}: {e}")
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if now - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = now
+        try:
+            self.queue.purge()
+        except sqlite3.Error as e:
+            print(f"Erro ao limpar jobs antigos: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers if self._pid == os.getpid() else 0,
+                'active': len(self._active),
+                'processed': self.processed,
+                'failed': self.failed
+            }
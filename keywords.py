@@ -0,0 +1,73 @@
+"""
+Motor de palavras-chave compilado uma única vez.
+
+Os léxicos ponderados são carregados de um arquivo JSON e compilados em uma
+única expressão regular com fronteira de palavra. Cada texto é pontuado em uma
+só passada, independente da quantidade de termos.
+"""
+import json
+import re
+import unicodedata
+
+
+def fold_text(text):
+    """Converte para minúsculas e remove acentos (ex.: 'Solicitação' -> 'solicitacao')"""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+class KeywordMatcher:
+    """Pontua textos contra léxicos ponderados por categoria"""
+
+    def __init__(self, lexicons):
+        """
+        Args:
+            lexicons (dict): {categoria: {termo: peso}}. Termos terminados em '*'
+                aceitam qualquer sufixo de palavra.
+        """
+        self.categories = [name for name in lexicons if not name.startswith('_')]
+        self._terms = []  # (categoria, peso) por grupo da regex, na mesma ordem
+
+        alternatives = []
+        entries = [
+            (fold_text(term), category, float(weight))
+            for category in self.categories
+            for term, weight in lexicons[category].items()
+        ]
+        # Termos mais longos primeiro: 'feliz natal' deve vencer 'feliz'
+        entries.sort(key=lambda entry: len(entry[0].rstrip('*')), reverse=True)
+
+        for term, category, weight in entries:
+            wildcard = term.endswith('*')
+            body = re.escape(term.rstrip('*')).replace(r'\ ', r'\s+')
+            alternatives.append(f"({body}\\w*)" if wildcard else f"({body})")
+            self._terms.append((category, weight))
+
+        self._pattern = re.compile(r'\b(?:' + '|'.join(alternatives) + r')\b') if alternatives else None
+
+    @classmethod
+    def from_file(cls, path):
+        """Carrega os léxicos de um arquivo JSON"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def score(self, text):
+        """
+        Pontua o texto em uma única passada.
+        Cada termo conta uma vez, mesmo que apareça várias vezes.
+
+        Returns:
+            dict: {categoria: soma dos pesos dos termos encontrados}
+        """
+        scores = dict.fromkeys(self.categories, 0.0)
+        if self._pattern is None:
+            return scores
+
+        seen = set()
+        for match in self._pattern.finditer(fold_text(text)):
+            group = match.lastindex
+            if group not in seen:
+                seen.add(group)
+                category, weight = self._terms[group - 1]
+                scores[category] += weight
+        return scores
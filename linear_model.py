@@ -0,0 +1,488 @@
+"""
+Classificador linear rápido treinado com os nossos emails rotulados.
+
+Os textos viram vetores esparsos de n-gramas de palavras com hashing (sem
+vocabulário para guardar), e uma regressão logística com regularização L2 dá a
+probabilidade de o email ser Produtivo. A confiança é calibrada (escala de
+Platt) em uma parte dos dados separada do treino, então 0.9 significa de fato
+~90% de acerto.
+
+O artefato é um .npz versionado com os pesos, a calibração e os metadados do
+treino. Correções enviadas pelos operadores (/api/feedback) atualizam os pesos
+de forma incremental (partial_fit) e o artefato é regravado; os demais workers
+trocam para os novos pesos ao perceber a mudança do arquivo, sem reiniciar.
+
+As correções mudam os pesos, mas não a calibração (não há dados separados para
+refazê-la a cada correção): stale_updates conta as correções incorporadas desde
+a última calibração. Recalibrar em um JSONL rotulado que não foi usado no treino:
+    python linear_model.py calibrate validacao.jsonl --model models/linear.npz
+
+Treinar e avaliar:
+    python linear_model.py train rotulados.jsonl -o models/linear.npz
+    python linear_model.py evaluate teste.jsonl --model models/linear.npz
+
+Cada linha do JSONL tem o texto ('text', ou 'subject'/'body') e o rótulo
+('label' ou 'category': Produtivo/Improdutivo, ou 1/0). O log de correções
+(data/feedback.jsonl) pode ser passado junto com os dados de treino.
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+from scipy import sparse
+from scipy.optimize import minimize
+
+from keywords import fold_text
+
+FORMAT_VERSION = 1
+LABELS = ('Improdutivo', 'Produtivo')  # Índice 1 = classe positiva
+DEFAULT_FEATURES = 2 ** 18
+DEFAULT_NGRAMS = (1, 2)
+MAX_CHARS = 20000
+
+_TOKEN = re.compile(r'\w+')
+
+
+def hash_features(text, n_features=DEFAULT_FEATURES, ngram_range=DEFAULT_NGRAMS):
+    """Contagem dos n-gramas do texto, indexados por hashing (crc32, estável entre processos)"""
+    tokens = _TOKEN.findall(fold_text(text[:MAX_CHARS]))
+    counts = {}
+    low, high = ngram_range
+    for n in range(low, high + 1):
+        for i in range(len(tokens) - n + 1):
+            gram = tokens[i] if n == 1 else ' '.join(tokens[i:i + n])
+            index = zlib.crc32(gram.encode('utf-8')) % n_features
+            counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+def vectorize(texts, n_features=DEFAULT_FEATURES, ngram_range=DEFAULT_NGRAMS):
+    """Matriz CSR (textos x features) com log(1 + contagem), normalizada por linha (L2)"""
+    indptr = [0]
+    indices = []
+    data = []
+    for text in texts:
+        counts = hash_features(text, n_features, ngram_range)
+        values = np.log1p(np.fromiter(counts.values(), dtype=np.float64, count=len(counts)))
+        norm = np.sqrt((values ** 2).sum())
+        indices.extend(counts.keys())
+        data.extend((values / norm) if norm else values)
+        indptr.append(len(indices))
+    return sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float64), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+        shape=(len(texts), n_features)
+    )
+
+
+def _sigmoid(z):
+    return 0.5 * (1.0 + np.tanh(0.5 * z))  # Estável para |z| grande
+
+
+def parse_label(value):
+    """Converte o rótulo do JSONL em 1 (Produtivo) ou 0 (Improdutivo)"""
+    normalized = fold_text(str(value)).strip()
+    if normalized in ('produtivo', 'productive', '1', 'true'):
+        return 1
+    if normalized in ('improdutivo', 'unproductive', '0', 'false'):
+        return 0
+    raise ValueError(f"Rótulo desconhecido: {value!r}")
+
+
+def load_labeled(path, text_field=None, label_field=None):
+    """Lê (textos, rótulos) de um JSONL rotulado ('label', ou 'category' como no log de correções)"""
+    texts = []
+    labels = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if text_field:
+                text = record.get(text_field) or ''
+            else:
+                text = record.get('text') or '\n\n'.join(
+                    str(record[key]) for key in ('subject', 'title', 'body') if record.get(key)
+                )
+            try:
+                labels.append(parse_label(record[label_field] if label_field else record.get('label', record.get('category'))))
+            except (KeyError, ValueError) as e:
+                raise ValueError(f"{path}:{line_number}: {e}")
+            texts.append(text)
+    return texts, np.asarray(labels, dtype=np.float64)
+
+
+class LinearClassifier:
+    """Regressão logística sobre n-gramas com hashing, com confiança calibrada"""
+
+    def __init__(self, n_features=DEFAULT_FEATURES, ngram_range=DEFAULT_NGRAMS, l2=1e-4):
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.l2 = l2
+        self.coef = np.zeros(n_features)
+        self.intercept = 0.0
+        self.calibration = (1.0, 0.0)  # Escala de Platt: sigmoid(a * logito + b)
+        self.metadata = {}
+
+    # Predição --------------------------------------------------------------
+
+    def decision_function(self, texts):
+        return vectorize(texts, self.n_features, self.ngram_range) @ self.coef + self.intercept
+
+    def predict_proba(self, texts):
+        """Probabilidade calibrada de cada texto ser Produtivo"""
+        a, b = self.calibration
+        return _sigmoid(a * self.decision_function(texts) + b)
+
+    def classify_batch(self, texts):
+        """Lista de (categoria, confiança) na mesma ordem dos textos"""
+        if not texts:
+            return []
+        return [
+            (LABELS[1], float(p)) if p >= 0.5 else (LABELS[0], float(1.0 - p))
+            for p in self.predict_proba(texts)
+        ]
+
+    def classify(self, text):
+        return self.classify_batch([text])[0]
+
+    def copy(self):
+        model = LinearClassifier(self.n_features, self.ngram_range, self.l2)
+        model.coef = self.coef.copy()
+        model.intercept = self.intercept
+        model.calibration = self.calibration
+        model.metadata = json.loads(json.dumps(self.metadata))
+        return model
+
+    # Treino ----------------------------------------------------------------
+
+    def fit(self, texts, labels, sample_weight=None, max_iter=200):
+        """Ajusta os pesos com L-BFGS (log-loss + L2)"""
+        X = vectorize(texts, self.n_features, self.ngram_range)
+        y = np.asarray(labels, dtype=np.float64)
+        weights = np.ones(len(y)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        total = weights.sum()
+
+        def loss_and_gradient(params):
+            coef, intercept = params[:-1], params[-1]
+            z = X @ coef + intercept
+            p = _sigmoid(z)
+            # log(1 + e^z) - y*z, calculado de forma estável
+            loss = (weights * (np.logaddexp(0, z) - y * z)).sum() / total + 0.5 * self.l2 * coef @ coef
+            residual = weights * (p - y) / total
+            gradient = np.empty_like(params)
+            gradient[:-1] = X.T @ residual + self.l2 * coef
+            gradient[-1] = residual.sum()
+            return loss, gradient
+
+        start = np.append(self.coef, self.intercept)
+        result = minimize(loss_and_gradient, start, jac=True, method='L-BFGS-B', options={'maxiter': max_iter})
+        self.coef, self.intercept = result.x[:-1], float(result.x[-1])
+        return self
+
+    def partial_fit(self, texts, labels, learning_rate=0.5, epochs=3):
+        """
+        Atualização incremental com poucos exemplos (ex.: correções de operadores):
+        alguns passos de gradiente da log-loss + L2, sem retreinar do zero.
+        """
+        X = vectorize(texts, self.n_features, self.ngram_range)
+        y = np.asarray(labels, dtype=np.float64)
+        for _ in range(epochs):
+            residual = _sigmoid(X @ self.coef + self.intercept) - y
+            self.coef *= 1.0 - learning_rate * self.l2
+            self.coef -= learning_rate * (X.T @ residual)
+            self.intercept -= learning_rate * float(residual.sum())
+
+        self.metadata['feedback_updates'] = self.metadata.get('feedback_updates', 0) + len(y)
+        self.metadata['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+        return self
+
+    def calibrate(self, texts, labels):
+        """Ajusta a escala de Platt sobre dados não usados no treino"""
+        z = self.decision_function(texts)
+        y = np.asarray(labels, dtype=np.float64)
+
+        def loss_and_gradient(params):
+            a, b = params
+            s = a * z + b
+            p = _sigmoid(s)
+            loss = (np.logaddexp(0, s) - y * s).mean()
+            return loss, np.array([((p - y) * z).mean(), (p - y).mean()])
+
+        result = minimize(loss_and_gradient, np.array([1.0, 0.0]), jac=True, method='L-BFGS-B')
+        self.calibration = (float(result.x[0]), float(result.x[1]))
+        self.metadata['calibrated_updates'] = self.metadata.get('feedback_updates', 0)
+        return self
+
+    @property
+    def stale_updates(self):
+        """Correções incorporadas aos pesos depois da última calibração (0: calibração em dia)"""
+        return self.metadata.get('feedback_updates', 0) - self.metadata.get('calibrated_updates', 0)
+
+    def evaluate(self, texts, labels, bins=10):
+        """Acurácia, log-loss e erro de calibração esperado (ECE)"""
+        y = np.asarray(labels, dtype=np.float64)
+        p = np.clip(self.predict_proba(texts), 1e-7, 1 - 1e-7)
+        predicted = (p >= 0.5).astype(np.float64)
+        confidence = np.where(predicted == 1, p, 1 - p)
+        correct = (predicted == y).astype(np.float64)
+
+        ece = 0.0
+        edges = np.linspace(0.5, 1.0, bins + 1)
+        for low, high in zip(edges[:-1], edges[1:]):
+            in_bin = (confidence >= low) & ((confidence < high) | (high == 1.0))
+            if in_bin.any():
+                ece += in_bin.mean() * abs(confidence[in_bin].mean() - correct[in_bin].mean())
+
+        return {
+            'samples': int(len(y)),
+            'accuracy': round(float(correct.mean()), 4) if len(y) else 0.0,
+            'log_loss': round(float(-(y * np.log(p) + (1 - y) * np.log(1 - p)).mean()), 4) if len(y) else 0.0,
+            'ece': round(float(ece), 4)
+        }
+
+    # Artefato --------------------------------------------------------------
+
+    def save(self, path):
+        """Grava o artefato de forma atômica (arquivo temporário + rename)"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.tmp-{os.getpid()}"
+        with open(temporary, 'wb') as f:
+            np.savez_compressed(
+                f,
+                format_version=np.array(FORMAT_VERSION),
+                coef=self.coef.astype(np.float32),
+                intercept=np.array(self.intercept),
+                calibration=np.array(self.calibration),
+                n_features=np.array(self.n_features),
+                ngram_range=np.array(self.ngram_range),
+                l2=np.array(self.l2),
+                metadata=np.array(json.dumps(self.metadata, ensure_ascii=False))
+            )
+        os.replace(temporary, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as artifact:
+            version = int(artifact['format_version'])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Versão do artefato não suportada: {version} (esperada: {FORMAT_VERSION})")
+            model = cls(int(artifact['n_features']), tuple(int(n) for n in artifact['ngram_range']), float(artifact['l2']))
+            model.coef = artifact['coef'].astype(np.float64)
+            model.intercept = float(artifact['intercept'])
+            model.calibration = tuple(float(value) for value in artifact['calibration'])
+            model.metadata = json.loads(str(artifact['metadata']))
+        return model
+
+    @property
+    def version(self):
+        """Versão do treino, seguida da quantidade de correções incorporadas (ex.: 20250101-120000+12)"""
+        version = self.metadata.get('model_version')
+        updates = self.metadata.get('feedback_updates')
+        return f"{version}+{updates}" if version and updates else version
+
+
+@contextmanager
+def _file_lock(path):
+    """Lock exclusivo entre processos (fcntl); sem fcntl (Windows), apenas dentro do processo"""
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    with open(path, 'a') as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class LinearModelStore:
+    """
+    Modelo linear em uso, trocado a quente quando o artefato muda em disco.
+
+    current() confere o arquivo no máximo a cada check_interval segundos, então
+    todos os workers passam a usar pesos atualizados por qualquer um deles.
+    update() aplica correções sob um lock de arquivo: relê o artefato (para não
+    perder atualizações de outros workers), ajusta uma cópia e a grava de forma
+    atômica; as requisições em andamento continuam com o modelo anterior.
+    """
+
+    def __init__(self, path, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._model = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self.reloads = 0
+        self._reload_if_changed()
+
+    def current(self):
+        """Modelo atual, ou None se ainda não há um modelo treinado"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self._reload_if_changed()
+        return self._model
+
+    def _reload_if_changed(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return
+        with self._lock:
+            if signature == self._signature:
+                return
+            try:
+                model = LinearClassifier.load(self.path)
+            except Exception as e:
+                # Mantém o modelo anterior; o arquivo será relido na próxima verificação
+                print(f"Erro ao recarregar o classificador linear: {e}")
+                return
+            if self._model is not None:
+                self.reloads += 1
+                print(f"Classificador linear atualizado: versão {model.version}")
+            self._model, self._signature = model, signature
+
+    def update(self, texts, labels, learning_rate=0.5):
+        """Incorpora correções ao modelo e grava o artefato; retorna o novo modelo (None sem modelo base)"""
+        with self._lock:
+            # Sem modelo treinado (ex.: clone novo, sem a pasta models/) não há o que atualizar nem travar
+            self._reload_if_changed()
+            if self._model is None:
+                return None
+            with _file_lock(self.path + '.lock'):
+                return self._update_locked(texts, labels, learning_rate)
+
+    def _update_locked(self, texts, labels, learning_rate):
+        self._reload_if_changed()
+        model = self._model.copy()
+        model.partial_fit(texts, labels, learning_rate=learning_rate)
+        model.save(self.path)
+
+        stat = os.stat(self.path)
+        self._model, self._signature = model, (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        return model
+
+
+def train(texts, labels, n_features=DEFAULT_FEATURES, ngram_range=DEFAULT_NGRAMS, l2=1e-4,
+          calibration_split=0.2, balanced=False, seed=42):
+    """
+    Treina o modelo, calibrando a confiança em calibration_split dos dados.
+    Retorna o modelo e as métricas da parte separada.
+    """
+    labels = np.asarray(labels, dtype=np.float64)
+    order = np.random.default_rng(seed).permutation(len(texts))
+    held_out = int(len(texts) * calibration_split) if len(texts) >= 20 else 0
+    calibration_idx, train_idx = order[:held_out], order[held_out:]
+
+    train_texts = [texts[i] for i in train_idx]
+    train_labels = labels[train_idx]
+    weights = None
+    if balanced:
+        positives = train_labels.mean()
+        if 0 < positives < 1:
+            weights = np.where(train_labels == 1, 0.5 / positives, 0.5 / (1 - positives))
+
+    model = LinearClassifier(n_features, ngram_range, l2)
+    model.fit(train_texts, train_labels, sample_weight=weights)
+
+    metrics = {}
+    if held_out:
+        calibration_texts = [texts[i] for i in calibration_idx]
+        metrics['uncalibrated'] = model.evaluate(calibration_texts, labels[calibration_idx])
+        model.calibrate(calibration_texts, labels[calibration_idx])
+        metrics['calibrated'] = model.evaluate(calibration_texts, labels[calibration_idx])
+
+    model.metadata = {
+        'model_version': time.strftime('%Y%m%d-%H%M%S'),
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'train_samples': len(train_idx),
+        'calibration_samples': held_out,
+        'positive_rate': round(float(labels.mean()), 4) if len(labels) else 0.0,
+        'metrics': metrics
+    }
+    return model, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Treina e avalia o classificador linear")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help='Treina um modelo a partir de um JSONL rotulado')
+    train_parser.add_argument('data', nargs='+', help='Arquivos JSONL com texto e rótulo (ex.: dados + log de correções)')
+    train_parser.add_argument('-o', '--output', default=os.path.join('models', 'linear.npz'))
+    train_parser.add_argument('--features', type=int, default=DEFAULT_FEATURES, help='Dimensão do hashing')
+    train_parser.add_argument('--ngrams', type=int, default=DEFAULT_NGRAMS[1], help='Maior n-grama (padrão: 2)')
+    train_parser.add_argument('--l2', type=float, default=1e-4, help='Regularização L2')
+    train_parser.add_argument('--calibration-split', type=float, default=0.2, help='Fração separada para calibração')
+    train_parser.add_argument('--balanced', action='store_true', help='Compensa classes desbalanceadas')
+    train_parser.add_argument('--text-field')
+    train_parser.add_argument('--label-field')
+
+    calibrate_parser = subparsers.add_parser(
+        'calibrate', help='Refaz a calibração em um JSONL rotulado não usado no treino (após correções)'
+    )
+    calibrate_parser.add_argument('data')
+    calibrate_parser.add_argument('--model', default=os.path.join('models', 'linear.npz'))
+    calibrate_parser.add_argument('--text-field')
+    calibrate_parser.add_argument('--label-field')
+
+    evaluate_parser = subparsers.add_parser('evaluate', help='Avalia um modelo em um JSONL rotulado')
+    evaluate_parser.add_argument('data')
+    evaluate_parser.add_argument('--model', default=os.path.join('models', 'linear.npz'))
+    evaluate_parser.add_argument('--text-field')
+    evaluate_parser.add_argument('--label-field')
+
+    args = parser.parse_args()
+    texts, labels = [], []
+    for path in (args.data if args.command == 'train' else [args.data]):
+        file_texts, file_labels = load_labeled(path, args.text_field, args.label_field)
+        texts.extend(file_texts)
+        labels.extend(file_labels)
+    labels = np.asarray(labels, dtype=np.float64)
+
+    if args.command == 'train':
+        print(f"Treinando com {len(texts)} emails ({int(labels.sum())} produtivos)...")
+        started = time.perf_counter()
+        model, metrics = train(
+            texts, labels, args.features, (1, args.ngrams), args.l2, args.calibration_split, args.balanced
+        )
+        print(f"✅ Treino concluído em {time.perf_counter() - started:.1f}s")
+        print(json.dumps(metrics, ensure_ascii=False, indent=2))
+        print(f"💾 Modelo {model.version} salvo em {model.save(args.output)}")
+    elif args.command == 'calibrate':
+        # Mesmo lock das correções: uma correção em andamento não é sobrescrita
+        with _file_lock(args.model + '.lock'):
+            model = LinearClassifier.load(args.model)
+            stale = model.stale_updates
+            before = model.evaluate(texts, labels)
+            model.calibrate(texts, labels)
+            metrics = {'stale_updates': stale, 'before': before, 'after': model.evaluate(texts, labels)}
+            model.save(args.model)
+        print(json.dumps(metrics, ensure_ascii=False, indent=2))
+        print(f"💾 Calibração do modelo {model.version} atualizada em {args.model}")
+    else:
+        model = LinearClassifier.load(args.model)
+        started = time.perf_counter()
+        metrics = model.evaluate(texts, labels)
+        elapsed = time.perf_counter() - started
+        metrics['emails_per_second'] = round(len(texts) / elapsed, 1) if elapsed else 0.0
+        print(f"Modelo {model.version}:")
+        print(json.dumps(metrics, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
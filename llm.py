@@ -0,0 +1,231 @@
+"""
+Serviço assíncrono de geração com a OpenAI.
+
+Um único cliente AsyncOpenAI (com pool de conexões HTTP reutilizadas) roda em um
+event loop dedicado, em uma thread em segundo plano. Cada chamada tem prazo
+máximo, a concorrência é limitada por um semáforo e erros transitórios são
+repetidos com backoff exponencial e jitter.
+
+Código síncrono (rotas do Flask, triagem.py) usa chat_sync(), que não mantém a
+thread ocupada além do prazo; código assíncrono usa await chat().
+"""
+import asyncio
+import os
+import random
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from singleflight import AsyncSingleFlight
+
+DEFAULT_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+
+
+class LLMTimeoutError(Exception):
+    """A chamada não terminou dentro do prazo"""
+
+
+class LLMService:
+    """Cliente AsyncOpenAI compartilhado, com prazo, limite de concorrência e retentativas"""
+
+    def __init__(self, api_key=None, base_url=None, model=DEFAULT_MODEL, timeout=20.0,
+                 max_concurrency=8, max_retries=2, backoff_base=0.5, backoff_max=4.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._pid = None
+        self._client = None
+        self._semaphore = None
+        self._singleflight = None
+
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.active = 0
+
+    # Event loop dedicado ---------------------------------------------------
+
+    def _ensure_loop(self):
+        """Cria o event loop, o cliente e o semáforo no primeiro uso (e novamente após um fork)"""
+        if self._loop is not None and self._pid == os.getpid():
+            return self._loop
+        with self._lock:
+            if self._loop is not None and self._pid == os.getpid():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name='llm-event-loop', daemon=True)
+            thread.start()
+
+            self._client = None
+            self._semaphore = None
+            self._singleflight = None
+            self._pid = os.getpid()
+            self._loop = loop
+            return loop
+
+    def _get_client(self):
+        """Cliente criado dentro do event loop, com pool de conexões reutilizadas"""
+        if self._client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=min(5.0, self.timeout))
+            )
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=http_client,
+                max_retries=0  # As retentativas (com jitter) são feitas aqui
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._singleflight = AsyncSingleFlight()
+        return self._client
+
+    # API assíncrona --------------------------------------------------------
+
+    async def chat(self, messages, deadline=None, dedupe_key=None, **params):
+        """
+        Executa uma chat completion e retorna o conteúdo da resposta.
+
+        Args:
+            messages (list): Mensagens no formato da API.
+            deadline (float): Prazo total em segundos, incluindo retentativas e espera na fila.
+            dedupe_key (str): Chamadas simultâneas com a mesma chave compartilham o resultado.
+            **params: Parâmetros da API (max_tokens, temperature, response_format...).
+        """
+        self._get_client()
+        call = lambda: self._chat_with_deadline(messages, deadline or self.timeout, params)
+        if dedupe_key is not None:
+            return await self._singleflight.do(dedupe_key, call)
+        return await call()
+
+    async def chat_many(self, requests, deadline=None):
+        """
+        Executa várias chat completions em paralelo (respeitando o limite de concorrência).
+
+        Args:
+            requests (list): Lista de dicts com 'messages' e demais parâmetros.
+
+        Returns:
+            list: Conteúdo de cada resposta ou a exceção correspondente, na mesma ordem.
+        """
+        tasks = [self.chat(deadline=deadline, **request) for request in requests]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _chat_with_deadline(self, messages, deadline, params):
+        try:
+            return await asyncio.wait_for(self._chat_with_retries(messages, params), deadline)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise LLMTimeoutError(f"OpenAI não respondeu em {deadline:.1f}s")
+
+    async def _chat_with_retries(self, messages, params):
+        client = self._get_client()
+        params = dict(params)
+        model = params.pop('model', self.model)
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                self.calls += 1
+                self.active += 1
+                try:
+                    response = await client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        **params
+                    )
+                    return response.choices[0].message.content.strip()
+                except Exception as e:
+                    if attempt >= self.max_retries or not _is_retryable(e):
+                        self.failures += 1
+                        raise
+                finally:
+                    self.active -= 1
+
+            # Backoff exponencial com jitter completo, fora do semáforo
+            attempt += 1
+            self.retries += 1
+            await asyncio.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+
+    # API síncrona ----------------------------------------------------------
+
+    def submit(self, coro):
+        """Agenda uma corrotina no event loop do serviço e retorna um concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro, timeout=None):
+        """Executa uma corrotina no event loop do serviço e aguarda o resultado"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise LLMTimeoutError("Tempo esgotado aguardando a OpenAI")
+
+    def chat_sync(self, messages, deadline=None, dedupe_key=None, **params):
+        """Versão síncrona de chat(), para código que roda em threads"""
+        deadline = deadline or self.timeout
+        # Margem para a corrotina encerrar por conta própria ao atingir o prazo
+        return self.run(self.chat(messages, deadline=deadline, dedupe_key=dedupe_key, **params), deadline + 1.0)
+
+    def chat_many_sync(self, requests, deadline=None):
+        """Versão síncrona de chat_many()"""
+        deadline = deadline or self.timeout
+        return self.run(self.chat_many(requests, deadline=deadline), deadline + 1.0)
+
+    def stats(self):
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'active': self.active,
+            'max_concurrency': self.max_concurrency
+        }
+
+
+def _is_retryable(error):
+    """Erros transitórios: timeout, conexão, limite de taxa e erros 5xx"""
+    import openai
+
+    return isinstance(error, (
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.RateLimitError,
+        openai.InternalServerError
+    ))
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_llm_service():
+    """Instância compartilhada do serviço, configurada pelas variáveis de ambiente"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = LLMService(
+                    api_key=os.getenv('OPENAI_API_KEY'),
+                    base_url=os.getenv('OPENAI_BASE_URL') or None,
+                    model=os.getenv('OPENAI_MODEL', DEFAULT_MODEL),
+                    timeout=float(os.getenv('OPENAI_TIMEOUT', 20)),
+                    max_concurrency=int(os.getenv('OPENAI_MAX_CONCURRENCY', 8)),
+                    max_retries=int(os.getenv('OPENAI_MAX_RETRIES', 2))
+                )
+    return _service
@@ -1,89 +1,348 @@
+import io
 import os
-import sys
 import re
-from flask import Flask, request, jsonify, render_template
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from flask import Flask, Request, request, jsonify, render_template, g
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
-import PyPDF2
-import nltk
-from nltk.corpus import stopwords
-from nltk.stem import WordNetLemmatizer
-from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
-import openai
 from dotenv import load_dotenv
+from cascade import CascadeClassifier, CascadeResult
+from cache import ResultCache, content_hash
+from singleflight import SingleFlight
+from scheduler import InferenceScheduler
+from keywords import KeywordMatcher
+from models import ModelManager
+from backends import DEFAULT_MODEL, DEFAULT_ONNX_DIR
+from embeddings import DEFAULT_CENTROIDS_PATH, DEFAULT_ENCODER, DEFAULT_PROTOTYPES_DIR
+from extraction import ExtractionError, extract_pdf, extract_text
+from llm import get_llm_service
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, Registry
+from feedback import FeedbackLog
+from preprocessing import Preprocessor
+from tokenization import TokenizationStage
+from chunking import STRATEGIES as CHUNK_STRATEGIES, aggregate as aggregate_windows, windows as token_windows
+from semantic_cache import SemanticResponseCache
+from circuit_breaker import CircuitBreaker
+from jobs import JobQueue, JobWorkerPool
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
 openai_api_key = os.getenv('OPENAI_API_KEY')
 
+
+
+class InMemoryRequest(Request):
+    """Mantém os uploads em memória (limitados por MAX_CONTENT_LENGTH), sem arquivos temporários"""
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 CORS(app)
 
 # Configurações
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'txt', 'pdf'}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
 
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Máximo de caracteres extraídos de cada arquivo; páginas além disso não são lidas
+EXTRACT_MAX_CHARS = int(os.getenv('EXTRACT_MAX_CHARS', 20000))
+
+# Configurações de processamento em lote
+BATCH_SIZE = int(os.getenv('BATCH_SIZE', 16))  # Emails por forward pass do modelo
+BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 5))  # Janela para juntar requisições concorrentes
+MAX_BATCH_ITEMS = int(os.getenv('MAX_BATCH_ITEMS', 100))  # Emails por requisição
+
+# Léxicos ponderados de palavras-chave
+KEYWORDS_CONFIG = os.getenv('KEYWORDS_CONFIG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'keywords.json'))
+
+# Cache de resultados por hash do conteúdo
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 10000))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 64MB
+CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 24 * 60 * 60))  # 24h
+CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH')  # Persistente e compartilhado entre workers
+
+# Estágios da cascata, em ordem: linear, keywords, embeddings, transformer
+# O fallback de palavras-chave é sempre acrescentado ao final
+CASCADE_TIERS = [tier.strip() for tier in os.getenv('CASCADE_TIERS', 'linear,keywords,transformer').split(',') if tier.strip()]
+
+# Confiança mínima para o estágio de palavras-chave decidir sem rodar o transformer
+CASCADE_KEYWORD_THRESHOLD = float(os.getenv('CASCADE_KEYWORD_THRESHOLD', 0.75))
+
+# Classificador linear treinado com emails rotulados (python linear_model.py train ...)
+LINEAR_MODEL_PATH = os.getenv('LINEAR_MODEL_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'linear.npz'))
+CASCADE_LINEAR_THRESHOLD = float(os.getenv('CASCADE_LINEAR_THRESHOLD', 0.8))
+LINEAR_RELOAD_INTERVAL = float(os.getenv('LINEAR_RELOAD_INTERVAL', 2))  # Segundos entre verificações do artefato
+# Correções incorporadas sem recalibrar a partir das quais a confiança do estágio
+# linear deixa de ser confiável e ele sai da cascata (0: sem limite)
+LINEAR_MAX_STALE_UPDATES = int(os.getenv('LINEAR_MAX_STALE_UPDATES', 50))
+
+# Estágio semântico: encoder de sentenças e centroides das categorias (veja embeddings.py)
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', DEFAULT_ENCODER)
+PROTOTYPES_DIR = os.getenv('PROTOTYPES_DIR', DEFAULT_PROTOTYPES_DIR)
+EMBEDDING_CENTROIDS_PATH = os.getenv('EMBEDDING_CENTROIDS_PATH', DEFAULT_CENTROIDS_PATH)
+CASCADE_EMBEDDING_THRESHOLD = float(os.getenv('CASCADE_EMBEDDING_THRESHOLD', 0.7))
+EMBEDDING_CACHE_ENTRIES = int(os.getenv('EMBEDDING_CACHE_ENTRIES', 20000))
+
+# Cache semântico de respostas da OpenAI (veja semantic_cache.py); usa o encoder do estágio semântico
+SEMANTIC_CACHE = os.getenv('SEMANTIC_CACHE', 'off') == 'on'
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 5000))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv('SEMANTIC_CACHE_TTL_SECONDS', 7 * 24 * 60 * 60))  # 7 dias
+SEMANTIC_CACHE_MAX_REUSES = int(os.getenv('SEMANTIC_CACHE_MAX_REUSES', 50))
+SEMANTIC_CACHE_PERSONALIZE = os.getenv('SEMANTIC_CACHE_PERSONALIZE', 'on') == 'on'
+
+# Circuit breaker da OpenAI: abre após falhas consecutivas (erros ou chamadas acima do SLO)
+LLM_CIRCUIT_FAILURES = int(os.getenv('LLM_CIRCUIT_FAILURES', 5))
+LLM_LATENCY_SLO_MS = float(os.getenv('LLM_LATENCY_SLO_MS', 8000))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv('LLM_CIRCUIT_RESET_SECONDS', 30))
+# Prazo para a resposta da OpenAI; depois dele o template é retornado e a resposta vai para o cache (0 = desligado)
+LLM_LATENCY_BUDGET_MS = float(os.getenv('LLM_LATENCY_BUDGET_MS', 0))
+
+# Correções dos operadores: log durável e atualização incremental do classificador linear
+FEEDBACK_LOG = os.getenv('FEEDBACK_LOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'feedback.jsonl'))
+FEEDBACK_LEARNING_RATE = float(os.getenv('FEEDBACK_LEARNING_RATE', 0.5))
+
+# Fila de jobs assíncronos (POST /api/jobs): SQLite local compartilhado pelos workers
+JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'jobs.db'))
+JOBS_WORKERS = int(os.getenv('JOBS_WORKERS', 2))  # Threads consumidoras por processo (0: apenas enfileira)
+JOBS_VISIBILITY_TIMEOUT = float(os.getenv('JOBS_VISIBILITY_TIMEOUT', 300))  # Prazo até um job travado voltar à fila
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 3))
+JOBS_RESULT_TTL_SECONDS = float(os.getenv('JOBS_RESULT_TTL_SECONDS', 7 * 24 * 60 * 60))
+
+# Máximo de tokens distintos no cache de lemas e stop words do pré-processamento
+PREPROCESS_CACHE_SIZE = int(os.getenv('PREPROCESS_CACHE_SIZE', 100000))
+
+# Tokenização compartilhada entre o transformer e o prompt da OpenAI (veja tokenization.py)
+TOKEN_CACHE_ENTRIES = int(os.getenv('TOKEN_CACHE_ENTRIES', 10000))
+PROMPT_EMAIL_TOKENS = int(os.getenv('PROMPT_EMAIL_TOKENS', 160))  # Trecho do email enviado no prompt
+
+# Emails longos no transformer: janelas de tokens sobrepostas (veja chunking.py)
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', 128))
+CHUNK_MAX_WINDOWS = int(os.getenv('CHUNK_MAX_WINDOWS', 8))  # 1 desliga as janelas: só o início é classificado
+CHUNK_AGGREGATION = os.getenv('CHUNK_AGGREGATION', 'max')  # max, mean ou first
+CHUNK_FIRST_WEIGHT = float(os.getenv('CHUNK_FIRST_WEIGHT', 2.0))  # Peso da primeira janela em 'first'
+if CHUNK_AGGREGATION not in CHUNK_STRATEGIES:
+    print(f"Aviso: CHUNK_AGGREGATION desconhecida '{CHUNK_AGGREGATION}'. Usando 'max'.")
+    CHUNK_AGGREGATION = 'max'
+
+# Carga dos modelos: 'background' (não bloqueia a importação) ou 'eager' (bloqueia até carregar)
+MODEL_LOADING = os.getenv('MODEL_LOADING', 'background')
+
+# Backend de inferência: 'torch' (padrão), 'onnx' ou 'onnx-int8' (veja backends.py)
+MODEL_NAME = os.getenv('MODEL_NAME', DEFAULT_MODEL)
+INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'torch')
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', DEFAULT_ONNX_DIR)
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 0))  # Threads do ONNX Runtime (0: padrão da biblioteca)
+
 app.config['MAX_CONTENT_LENGTH'] = MAX_FILE_SIZE
 
-# Criar pasta de uploads se não existir
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Compilar o motor de palavras-chave uma única vez
+keyword_matcher = KeywordMatcher.from_file(KEYWORDS_CONFIG)
+
+# Cache de classificações e respostas geradas
+result_cache = ResultCache(
+    max_entries=CACHE_MAX_ENTRIES,
+    max_bytes=CACHE_MAX_BYTES,
+    ttl=CACHE_TTL_SECONDS,
+    sqlite_path=CACHE_SQLITE_PATH
+)
+
+# Respostas reaproveitadas entre emails parecidos (mesma categoria, similaridade acima do limiar)
+semantic_cache = SemanticResponseCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    ttl=SEMANTIC_CACHE_TTL_SECONDS,
+    max_reuses=SEMANTIC_CACHE_MAX_REUSES,
+    personalization=SEMANTIC_CACHE_PERSONALIZE
+) if SEMANTIC_CACHE else None
+
+# Com a OpenAI lenta ou fora do ar, as respostas usam templates sem esperar a chamada falhar
+llm_breaker = CircuitBreaker(
+    failure_threshold=LLM_CIRCUIT_FAILURES,
+    latency_slo=LLM_LATENCY_SLO_MS / 1000,
+    reset_timeout=LLM_CIRCUIT_RESET_SECONDS
+)
+
+# Gerações em andamento por chave: uma resposta que estourou o prazo não é pedida de novo
+pending_responses = {}
+pending_responses_lock = threading.Lock()
 
-# Baixar recursos do NLTK
-print("Baixando recursos do NLTK...")
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
+# Requisições concorrentes com o mesmo conteúdo compartilham um único cálculo
+inflight = SingleFlight()
+
+# Métricas expostas em /api/metrics (formato Prometheus)
+metrics_registry = Registry()
+stage_seconds = metrics_registry.histogram(
+    'email_stage_duration_seconds', 'Duração de cada etapa do processamento de emails', ['stage']
+)
+fallbacks = metrics_registry.counter(
+    'email_fallbacks_total', 'Resultados produzidos por um caminho de fallback', ['kind']
+)
+requests_in_progress = metrics_registry.gauge(
+    'http_requests_in_progress', 'Requisições HTTP em andamento', ['endpoint']
+)
+request_seconds = metrics_registry.histogram(
+    'http_request_duration_seconds', 'Duração das requisições HTTP', ['endpoint']
+)
+requests_total = metrics_registry.counter(
+    'http_requests_total', 'Requisições HTTP atendidas', ['endpoint', 'status']
+)
+feedback_total = metrics_registry.counter(
+    'email_feedback_total', 'Correções de classificação recebidas', ['category']
+)
+model_windows = metrics_registry.counter(
+    'email_model_windows_total', 'Janelas de tokens classificadas pelo transformer', ['kind']
+)
+windows_capped = metrics_registry.counter(
+    'email_model_windows_capped_total', 'Emails longos com trechos além de CHUNK_MAX_WINDOWS não classificados'
+)
+
+feedback_log = FeedbackLog(FEEDBACK_LOG)
+EMAIL_ID_PATTERN = re.compile(r'email_text:[0-9a-f]{64}')
+
+job_queue = JobQueue(
+    JOBS_DB_PATH,
+    visibility_timeout=JOBS_VISIBILITY_TIMEOUT,
+    max_attempts=JOBS_MAX_ATTEMPTS,
+    result_ttl=JOBS_RESULT_TTL_SECONDS
+)
+
+def load_nltk_resources():
+    """Baixa os recursos do NLTK e monta o pré-processador com lemmatizador e stop words"""
+    import nltk
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    
+    # A tokenização é feita por regex (preprocessing.py): o punkt não é necessário
     try:
-        nltk.download('punkt', quiet=True)
-    except:
-        pass
-
-# Baixar punkt_tab (versão mais recente)
-try:
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
+        nltk.data.find('corpora/stopwords')
+    except LookupError:
+        nltk.download('stopwords', quiet=True)
+    
     try:
-        nltk.download('punkt_tab', quiet=True)
-    except Exception as e:
-        print(f"Aviso: Não foi possível baixar punkt_tab: {e}")
-
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords', quiet=True)
-
-try:
-    nltk.data.find('corpora/wordnet')
-except LookupError:
-    nltk.download('wordnet', quiet=True)
-
-print("Recursos do NLTK prontos!")
-
-# Inicializar componentes de NLP
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('portuguese') + stopwords.words('english'))
-
-# Inicializar modelos de IA
-print("Carregando modelos de IA...")
-try:
-    # Modelo para classificação de sentimento/texto (adaptado para produtivo/improdutivo)
-    classifier = pipeline(
-        "text-classification",
-        model="nlptown/bert-base-multilingual-uncased-sentiment",
-        device=-1  # CPU
+        nltk.data.find('corpora/wordnet')
+    except LookupError:
+        nltk.download('wordnet', quiet=True)
+    
+    return Preprocessor(
+        lemmatize=WordNetLemmatizer().lemmatize,
+        stop_words=stopwords.words('portuguese') + stopwords.words('english'),
+        cache_size=PREPROCESS_CACHE_SIZE
+    )
+
+
+def load_classifier():
+    """Carrega o modelo de classificação de sentimento/texto (adaptado para produtivo/improdutivo)"""
+    from backends import create_backend
+    
+    classifier = create_backend(INFERENCE_BACKEND, MODEL_NAME, ONNX_MODEL_DIR, INFERENCE_THREADS)
+    print(f"Backend de inferência: {classifier.name}")
+    return classifier
+
+
+def load_linear_model():
+    """
+    Carrega o classificador linear. O artefato é acompanhado: pesos atualizados por
+    correções (ou um novo treino) entram em uso sem reiniciar. Enquanto não houver
+    um modelo treinado, o estágio fica desligado.
+    """
+    from linear_model import LinearModelStore
+    
+    store = LinearModelStore(LINEAR_MODEL_PATH, check_interval=LINEAR_RELOAD_INTERVAL)
+    model = store.current()
+    if model is None:
+        print(f"Classificador linear não encontrado em {LINEAR_MODEL_PATH} - estágio desligado")
+    else:
+        print(f"Classificador linear: versão {model.version}")
+    return store
+
+
+def load_embedding_classifier():
+    """Carrega o encoder de sentenças e os centroides das categorias (recalculados se os exemplos mudaram)"""
+    from embeddings import EmbeddingCache, PrototypeClassifier, SentenceEncoder
+    
+    encoder = SentenceEncoder(EMBEDDING_MODEL)
+    classifier = PrototypeClassifier.load(
+        encoder, PROTOTYPES_DIR, EMBEDDING_CENTROIDS_PATH, cache=EmbeddingCache(EMBEDDING_CACHE_ENTRIES)
     )
-    print("Modelo de classificação carregado!")
-except Exception as e:
-    print(f"Erro ao carregar modelo de classificação: {e}")
-    classifier = None
+    print(f"Classificador semântico: {', '.join(classifier.categories)}")
+    return classifier
+
+
+_token_stage = None
+_token_stage_lock = threading.Lock()
+
+
+def current_token_stage():
+    """Tokenização com o tokenizador do classificador carregado, ou None enquanto ele carrega"""
+    global _token_stage
+    classifier = model_manager.get('classifier')
+    if classifier is None:
+        return None
+    if _token_stage is None or _token_stage.tokenizer is not classifier.tokenizer:
+        with _token_stage_lock:
+            if _token_stage is None or _token_stage.tokenizer is not classifier.tokenizer:
+                _token_stage = TokenizationStage(classifier.tokenizer, cache_size=TOKEN_CACHE_ENTRIES)
+    return _token_stage
+
+
+def current_linear_model():
+    """Versão em uso do classificador linear, ou None"""
+    store = model_manager.get('linear')
+    return store.current() if store is not None else None
+
+
+def linear_calibration_ok(model):
+    """
+    A calibração de Platt vem do último treino; as correções mudam os pesos sem
+    refazê-la. Passado LINEAR_MAX_STALE_UPDATES, a confiança não é mais comparável
+    ao limiar e o estágio para de decidir até `python linear_model.py calibrate`.
+    """
+    return not LINEAR_MAX_STALE_UPDATES or model.stale_updates <= LINEAR_MAX_STALE_UPDATES
+
+
+def linear_tier_enabled():
+    model = current_linear_model()
+    return model is not None and linear_calibration_ok(model)
+
+
+def linear_stats():
+    """Versão e estado da calibração do classificador linear, ou None sem modelo"""
+    model = current_linear_model()
+    if model is None:
+        return None
+    return {
+        'version': model.version,
+        'stale_updates': model.stale_updates,
+        'max_stale_updates': LINEAR_MAX_STALE_UPDATES,
+        'calibration_ok': linear_calibration_ok(model)
+    }
+
+
+# Recursos pesados são carregados fora da importação; até ficarem prontos,
+# a cascata usa o fallback de palavras-chave
+model_manager = ModelManager()
+model_manager.register('nltk', load_nltk_resources)
+model_manager.register('linear', load_linear_model)
+if 'embeddings' in CASCADE_TIERS or SEMANTIC_CACHE:
+    model_manager.register('embeddings', load_embedding_classifier)
+if 'transformer' in CASCADE_TIERS:
+    model_manager.register('classifier', load_classifier)
+
+if MODEL_LOADING == 'eager':
+    model_manager.load_all()
+else:
+    model_manager.start()
 
 # Configurar OpenAI (opcional, para respostas mais sofisticadas)
-openai_api_key = os.getenv('OPENAI_API_KEY')
+# O cliente assíncrono compartilhado só é criado na primeira chamada
+llm_service = get_llm_service()
 if openai_api_key:
-    openai.api_key = openai.api_key
     print("OpenAI configurado!")
 else:
     print("OpenAI não configurado - usando modelo local")
@@ -94,124 +353,201 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def extract_text_from_pdf(file_path):
-    """Extrai texto de um arquivo PDF"""
-    try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text
-    except Exception as e:
-        raise Exception(f"Erro ao ler PDF: {str(e)}")
+@stage_seconds.time(stage='extract')
+def extract_text_from_pdf(file_path, max_chars=None):
+    """Extrai texto de um arquivo PDF, página por página, até max_chars caracteres"""
+    with open(file_path, 'rb') as file:
+        return extract_pdf(file, max_chars or EXTRACT_MAX_CHARS).text
+
 
+# Recursos do NLTK ainda carregando: apenas tokenização, sem stop words nem lemas
+basic_preprocessor = Preprocessor()
 
+
+def current_preprocessor():
+    return model_manager.get('nltk') or basic_preprocessor
+
+
+@stage_seconds.time(stage='preprocess')
 def preprocess_text(text):
     """
     Pré-processa o texto usando técnicas de NLP:
     - Remove caracteres especiais
     - Remove stop words
     - Aplica lemmatização
+    Não é chamado pelas rotas: roda apenas para quem usa o texto processado.
     """
-    # Converter para minúsculas
-    text = text.lower()
-    
-    # Remover caracteres especiais, mantendo espaços e pontuação básica
-    text = re.sub(r'[^\w\s]', ' ', text)
+    return current_preprocessor().process(text)
+
+
+@stage_seconds.time(stage='preprocess_batch')
+def preprocess_texts(texts):
+    """Pré-processa vários textos; cada token distinto do lote é lematizado uma única vez"""
+    return current_preprocessor().process_batch(texts)
+
+
+@stage_seconds.time(stage='classify')
+def classify_email(text):
+    """
+    Classifica o email como Produtivo ou Improdutivo usando a cascata de estágios.
+    Retorna CascadeResult(category, confidence, tier), onde tier é o estágio que decidiu.
+    """
+    key = content_hash(text, 'classify')
+    cached = result_cache.get(key)
+    if cached is not None:
+        return CascadeResult(*cached)
     
-    # Tokenizar - tentar português, se falhar usar inglês
-    try:
-        tokens = nltk.word_tokenize(text, language='portuguese')
-    except LookupError:
-        # Se não tiver tokenizer português, usar inglês ou split simples
-        try:
-            tokens = nltk.word_tokenize(text)
-        except:
-            # Fallback: split simples por espaços
-            tokens = text.split()
-    
-    # Remover stop words e aplicar lemmatização
-    processed_tokens = [
-        lemmatizer.lemmatize(token) 
-        for token in tokens 
-        if token not in stop_words and len(token) > 2
-    ]
+    return inflight.do(key, lambda: _classify_uncached(key, text))
+
+
+def _classify_uncached(key, text):
+    """Classifica e armazena no cache; executado uma vez por conteúdo em andamento"""
+    # Outra requisição pode ter concluído entre a consulta ao cache e o single-flight
+    cached = result_cache.get(key)
+    if cached is not None:
+        return CascadeResult(*cached)
     
-    return ' '.join(processed_tokens)
+    result = cascade.classify(text)
+    cache_classification(key, result)
+    return result
 
 
-def classify_email(text):
+@stage_seconds.time(stage='classify_batch')
+def classify_emails_batch(texts):
     """
-    Classifica o email como Produtivo ou Improdutivo usando IA
+    Classifica uma lista de emails. Cada estágio da cascata roda em lote sobre os
+    emails ainda não decididos; o agendador agrupa os textos do transformer em lotes
+    de BATCH_SIZE com padding por lote, evitando um forward pass por email.
     """
-    if not classifier:
-        # Fallback: classificação baseada em palavras-chave
-        return classify_with_keywords(text)
+    if not texts:
+        return []
     
-    try:
-        # Usar o modelo de classificação
-        result = classifier(text[:512])  # Limitar tamanho para o modelo
-        
-        # Adaptar resultado do modelo de sentimento para nossa classificação
-        # Analisar palavras-chave para determinar se é produtivo
-        productive_keywords = [
-            'solicitação', 'requisição', 'suporte', 'problema', 'erro', 'ajuda',
-            'atualização', 'status', 'caso', 'ticket', 'dúvida', 'questão',
-            'arquivo', 'documento', 'urgente', 'importante', 'ação', 'resolver'
-        ]
-        
-        unproductive_keywords = [
-            'feliz natal', 'feliz ano novo', 'parabéns', 'agradecimento',
-            'obrigado', 'obrigada', 'cumprimento', 'saudações', 'saudação'
-        ]
-        
-        text_lower = text.lower()
-        productive_score = sum(1 for keyword in productive_keywords if keyword in text_lower)
-        unproductive_score = sum(1 for keyword in unproductive_keywords if keyword in text_lower)
-        
-        # Se há palavras-chave claras, usar elas
-        if productive_score > unproductive_score and productive_score > 0:
-            return "Produtivo", 0.85
-        elif unproductive_score > productive_score and unproductive_score > 0:
-            return "Improdutivo", 0.85
-        
-        # Caso contrário, usar o modelo de sentimento como base
-        # Sentimentos negativos/neutros tendem a ser produtivos (requerem ação)
-        # Sentimentos muito positivos podem ser improdutivos (cumprimentos)
-        label = result[0]['label'] if isinstance(result, list) else result.get('label', '')
-        score = result[0]['score'] if isinstance(result, list) else result.get('score', 0.5)
-        
-        # Lógica adaptada: se o texto é curto e muito positivo, provavelmente é improdutivo
-        if len(text.split()) < 20 and 'POSITIVE' in str(label).upper():
-            return "Improdutivo", min(score + 0.1, 0.95)
-        else:
-            return "Produtivo", min(score + 0.1, 0.95)
-            
-    except Exception as e:
-        print(f"Erro na classificação com IA: {e}")
-        return classify_with_keywords(text)
+    keys = [content_hash(text, 'classify') for text in texts]
+    results = [None] * len(texts)
+    for i, key in enumerate(keys):
+        cached = result_cache.get(key)
+        if cached is not None:
+            results[i] = CascadeResult(*cached)
+    
+    # Apenas os emails fora do cache passam pela cascata
+    missing = [i for i, result in enumerate(results) if result is None]
+    for i, result in zip(missing, cascade.classify_batch([texts[i] for i in missing])):
+        results[i] = result
+        cache_classification(keys[i], result)
+    
+    return results
 
 
-def classify_with_keywords(text):
-    """Classificação baseada em palavras-chave (fallback)"""
-    text_lower = text.lower()
+def cache_classification(key, result):
+    """Armazena a classificação; resultados do fallback não são armazenados
+    para que o email seja reclassificado quando o modelo voltar"""
+    if result.tier == 'keywords_fallback':
+        fallbacks.inc(kind='keywords')
+    else:
+        result_cache.set(key, list(result))
+
+
+def classify_keyword_tier(text):
+    """Estágio barato da cascata: palavras-chave. Abstém-se quando não há evidência"""
+    scores = keyword_matcher.score(text)
+    productive_score = scores["Produtivo"]
+    unproductive_score = scores["Improdutivo"]
     
-    productive_keywords = [
-        'solicitação', 'requisição', 'suporte', 'problema', 'erro', 'ajuda',
-        'atualização', 'status', 'caso', 'ticket', 'dúvida', 'questão',
-        'arquivo', 'documento', 'urgente', 'importante', 'ação', 'resolver',
-        'preciso', 'necessito', 'gostaria', 'poderia', 'favor'
-    ]
+    if productive_score == unproductive_score:
+        return None
     
-    unproductive_keywords = [
-        'feliz natal', 'feliz ano novo', 'parabéns', 'agradecimento',
-        'obrigado', 'obrigada', 'cumprimento', 'saudações', 'saudação',
-        'bom dia', 'boa tarde', 'boa noite', 'feliz', 'aniversario'
+    # A confiança cresce com a diferença entre as pontuações
+    category = "Produtivo" if productive_score > unproductive_score else "Improdutivo"
+    margin = abs(productive_score - unproductive_score)
+    return category, min(0.7 + (margin * 0.05), 0.95)
+
+
+def classify_linear_tier(text):
+    """Estágio do classificador linear: n-gramas com hashing, confiança calibrada"""
+    return current_linear_model().classify(text)
+
+
+def classify_linear_tier_batch(texts):
+    """Estágio linear em lote: uma única matriz esparsa para todos os textos"""
+    return current_linear_model().classify_batch(texts)
+
+
+def classify_embedding_tier(text):
+    """Estágio semântico: centroide mais próximo do embedding do email"""
+    return model_manager.get('embeddings').classify(text)
+
+
+def classify_embedding_tier_batch(texts):
+    """Estágio semântico em lote: um forward pass do encoder e uma multiplicação de matrizes"""
+    return model_manager.get('embeddings').classify_batch(texts)
+
+
+def classify_model_tier(text):
+    """Estágio caro da cascata: modelo transformer (via agendador de micro-batching)"""
+    return classify_model_tier_batch([text])[0]
+
+
+def classify_model_tier_batch(texts):
+    """
+    Estágio transformer em lote: os textos são tokenizados de uma vez (ou vêm do
+    cache de tokens) e divididos em janelas no orçamento de tokens do modelo.
+    As janelas de todos os textos são enfileiradas juntas no agendador, e as
+    saídas de cada texto são combinadas por CHUNK_AGGREGATION
+    """
+    stage = current_token_stage()
+    id_lists, spans = [], []
+    for encoding in stage.encode(texts):
+        chunks, capped = token_windows(encoding.ids, stage.max_tokens, CHUNK_OVERLAP_TOKENS, CHUNK_MAX_WINDOWS)
+        model_windows.inc(len(chunks), kind='chunk' if len(chunks) > 1 or capped else 'single')
+        if capped:
+            windows_capped.inc()
+        spans.append((len(id_lists), len(id_lists) + len(chunks)))
+        id_lists.extend(chunks)
+
+    results = inference_scheduler.predict(id_lists)
+    return [
+        interpret_model_result(text, aggregate_windows(results[start:end], CHUNK_AGGREGATION, CHUNK_FIRST_WEIGHT))
+        for text, (start, end) in zip(texts, spans)
     ]
+
+
+def run_classifier(id_lists):
+    """Forward pass em lote sobre ids já tokenizados; chamado apenas pela thread do agendador"""
+    classifier = model_manager.get('classifier')
+    return classifier.predict_ids(id_lists)
+
+
+# O agendador é o único a chamar o modelo: junta as requisições de todas as threads
+# em lotes de até BATCH_SIZE, esperando no máximo BATCH_MAX_WAIT_MS
+inference_scheduler = InferenceScheduler(
+    run_classifier,
+    max_batch_size=BATCH_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS
+)
+
+
+def interpret_model_result(text, result):
+    """Adapta a saída do modelo de sentimento para Produtivo/Improdutivo"""
+    # Sentimentos negativos/neutros tendem a ser produtivos (requerem ação)
+    # Sentimentos muito positivos podem ser improdutivos (cumprimentos)
+    # Chamadas com um texto retornam lista; chamadas em lote retornam um dict por texto
+    if isinstance(result, list):
+        result = result[0]
+    label = result.get('label', '')
+    score = result.get('score', 0.5)
     
-    productive_count = sum(1 for keyword in productive_keywords if keyword in text_lower)
-    unproductive_count = sum(1 for keyword in unproductive_keywords if keyword in text_lower)
+    # Lógica adaptada: se o texto é curto e muito positivo, provavelmente é improdutivo
+    if len(text.split()) < 20 and 'POSITIVE' in str(label).upper():
+        return "Improdutivo", min(score + 0.1, 0.95)
+    else:
+        return "Produtivo", min(score + 0.1, 0.95)
+
+
+def classify_with_keywords(text):
+    """Classificação baseada em palavras-chave (fallback)"""
+    scores = keyword_matcher.score(text)
+    productive_count = scores["Produtivo"]
+    unproductive_count = scores["Improdutivo"]
     
     if productive_count > unproductive_count:
         confidence = min(0.7 + (productive_count * 0.05), 0.95)
@@ -224,27 +560,115 @@ def classify_with_keywords(text):
         return "Produtivo", 0.6
 
 
+# Estágios disponíveis; CASCADE_TIERS escolhe quais participam e em que ordem
+TIERS = {
+    'linear': dict(
+        classify_fn=classify_linear_tier,
+        threshold=CASCADE_LINEAR_THRESHOLD,
+        batch_fn=classify_linear_tier_batch,
+        enabled=linear_tier_enabled
+    ),
+    'keywords': dict(classify_fn=classify_keyword_tier, threshold=CASCADE_KEYWORD_THRESHOLD),
+    'embeddings': dict(
+        classify_fn=classify_embedding_tier,
+        threshold=CASCADE_EMBEDDING_THRESHOLD,
+        batch_fn=classify_embedding_tier_batch,
+        enabled=lambda: model_manager.is_ready('embeddings')
+    ),
+    'transformer': dict(
+        classify_fn=classify_model_tier,
+        batch_fn=classify_model_tier_batch,
+        enabled=lambda: model_manager.is_ready('classifier')
+    )
+}
+
+# Cascata padrão: linear -> palavras-chave -> transformer -> palavras-chave (fallback)
+# O estágio linear só participa quando há um modelo treinado; o fallback só
+# decide quando os estágios de modelo não estão disponíveis ou falham
+cascade = CascadeClassifier()
+for tier_name in CASCADE_TIERS:
+    if tier_name not in TIERS:
+        raise ValueError(f"Estágio desconhecido em CASCADE_TIERS: {tier_name} (opções: {', '.join(TIERS)})")
+    cascade.add_tier(tier_name, **TIERS[tier_name])
+cascade.add_tier('keywords_fallback', classify_with_keywords)
+
+
+@stage_seconds.time(stage='generate')
 def generate_response(text, category):
     """
     Gera uma resposta automática baseada na categoria do email
     """
-    if openai_api_key:
-        try:
-            return generate_response_openai(text, category)
-        except Exception as e:
-            print(f"Erro ao gerar resposta com OpenAI: {e}")
-            return generate_response_template(category)
-    else:
+    if not openai_api_key:
         return generate_response_template(category)
+    
+    # Emails idênticos simultâneos aguardam uma única chamada à OpenAI
+    key = content_hash(text, f'response:{category}')
+    return inflight.do(key, lambda: generate_response_openai(text, category))
 
 
-def generate_response_openai(text, category):
-    """Gera resposta usando OpenAI GPT"""
+@stage_seconds.time(stage='generate_batch')
+def generate_responses_batch(texts, categories):
+    """
+    Gera as respostas de um lote de emails.
+    Com OpenAI, as chamadas fora do cache são feitas em paralelo pelo cliente
+    assíncrono (limitadas por OPENAI_MAX_CONCURRENCY); com templates não há custo.
+    Como em generate_response_openai, os emails sem resposta dentro do prazo
+    recebem o template e a geração termina em segundo plano, indo para o cache.
+    """
+    if not openai_api_key:
+        return [generate_response_template(category) for category in categories]
+    
+    keys = [content_hash(text, f'response:{category}') for text, category in zip(texts, categories)]
+    responses = [result_cache.get(key) for key in keys]
+    missing = [i for i, response in enumerate(responses) if response is None]
+    if not missing:
+        return responses
+    
+    # Emails parecidos com outros já respondidos reutilizam a resposta
+    vectors = response_embeddings([texts[i] for i in missing])
+    vectors = dict(zip(missing, vectors)) if vectors is not None else {}
+    for i in list(vectors):
+        reused = semantic_cache.lookup(vectors[i], categories[i], texts[i])
+        if reused is not None:
+            result_cache.set(keys[i], reused)
+            responses[i] = reused
+    missing = [i for i in missing if responses[i] is None]
+    if not missing:
+        return responses
+    
+    # Cada email é uma chamada ao circuito (meio aberto, só a de teste sai) e todas
+    # as gerações do lote compartilham o prazo de LLM_LATENCY_BUDGET_MS
+    futures = {i: start_llm_response(keys[i], texts[i], categories[i], vectors.get(i)) for i in missing}
+    deadline = time.monotonic() + llm_response_budget()
+    for i, future in futures.items():
+        if future is None:
+            fallbacks.inc(kind='circuit_open')
+            responses[i] = generate_response_template(categories[i])
+        else:
+            responses[i] = wait_llm_response(future, categories[i], deadline - time.monotonic())
+    return responses
+
+
+def response_embeddings(texts):
+    """Embeddings dos emails para o cache semântico; None se ele estiver desligado ou o encoder não estiver pronto"""
+    if semantic_cache is None:
+        return None
+    classifier = model_manager.get('embeddings')
+    if classifier is None:
+        return None
     try:
-        prompt = f"""Você é um assistente de atendimento de uma empresa financeira.
+        return classifier.embed(texts)
+    except Exception as e:
+        print(f"Erro ao calcular embeddings para o cache semântico: {e}")
+        return None
+
+
+def build_response_messages(text, category):
+    """Monta as mensagens do prompt de geração de resposta"""
+    prompt = f"""Você é um assistente de atendimento de uma empresa financeira.
         
 Email recebido:
-{text[:500]}
+{email_excerpt(text)}
 
 Categoria: {category}
 
@@ -253,21 +677,101 @@ Se for Produtivo, a resposta deve ser útil e direta ao ponto.
 Se for Improdutivo, a resposta deve ser cordial e breve.
 
 Resposta:"""
+    
+    return [
+        {"role": "system", "content": "Você é um assistente profissional de atendimento."},
+        {"role": "user", "content": prompt}
+    ]
 
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "Você é um assistente profissional de atendimento."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content.strip()
+
+def email_excerpt(text):
+    """Início do email que cabe em PROMPT_EMAIL_TOKENS, reaproveitando a tokenização do classificador"""
+    stage = current_token_stage()
+    if stage is None:
+        return text[:500]
+    return stage.prefix(text, stage.encode([text])[0], PROMPT_EMAIL_TOKENS)
+
+
+def generate_response_openai(text, category):
+    """
+    Gera resposta usando OpenAI GPT. Com o circuito aberto, após um erro ou quando
+    a OpenAI não responde dentro de LLM_LATENCY_BUDGET_MS, retorna o template.
+    """
+    # Emails idênticos (newsletters, felicitações) reutilizam a resposta já gerada
+    key = content_hash(text, f'response:{category}')
+    cached = result_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    # Paráfrases de emails já respondidos reutilizam a resposta, personalizada
+    vectors = response_embeddings([text])
+    if vectors is not None:
+        reused = semantic_cache.lookup(vectors[0], category, text)
+        if reused is not None:
+            result_cache.set(key, reused)
+            return reused
+    
+    future = start_llm_response(key, text, category, vectors[0] if vectors is not None else None)
+    if future is None:
+        fallbacks.inc(kind='circuit_open')
+        return generate_response_template(category)
+    
+    return wait_llm_response(future, category, llm_response_budget())
+
+
+def llm_response_budget():
+    """Espera máxima pela OpenAI: LLM_LATENCY_BUDGET_MS ou, sem ele, o timeout do cliente"""
+    return LLM_LATENCY_BUDGET_MS / 1000 if LLM_LATENCY_BUDGET_MS else llm_service.timeout + 1.0
+
+
+def wait_llm_response(future, category, timeout):
+    """Resposta da geração em andamento ou, após o prazo ou um erro, o template"""
+    try:
+        return future.result(max(0.0, timeout))
+    except FutureTimeoutError:
+        # A geração continua em segundo plano e a resposta fica no cache para o próximo email igual
+        fallbacks.inc(kind='budget' if LLM_LATENCY_BUDGET_MS else 'template')
     except Exception as e:
         print(f"Erro na geração com OpenAI: {e}")
-        return generate_response_template(category)
+        fallbacks.inc(kind='template')
+    return generate_response_template(category)
+
+
+def start_llm_response(key, text, category, vector):
+    """
+    Inicia a geração no event loop do serviço de LLM (ou reaproveita a que já está
+    em andamento para a mesma chave) e retorna o Future; None com o circuito aberto.
+    Ao terminar, o resultado alimenta o circuit breaker e os caches.
+    """
+    with pending_responses_lock:
+        future = pending_responses.get(key)
+        if future is not None:
+            return future
+        if not llm_breaker.allow():
+            return None
+        started = time.perf_counter()
+        # Chamada com prazo máximo pelo cliente assíncrono compartilhado
+        future = llm_service.submit(llm_service.chat(
+            build_response_messages(text, category),
+            max_tokens=200,
+            temperature=0.7
+        ))
+        pending_responses[key] = future
+    
+    def finish(done):
+        with pending_responses_lock:
+            pending_responses.pop(key, None)
+        if done.cancelled() or done.exception() is not None:
+            llm_breaker.record_failure()
+            return
+        llm_breaker.record_success(time.perf_counter() - started)
+        answer = done.result()
+        result_cache.set(key, answer)
+        if vector is not None:
+            semantic_cache.add(vector, category, text, answer)
+    
+    future.add_done_callback(finish)
+    return future
 
 
 def generate_response_template(category):
@@ -296,12 +800,75 @@ Atenciosamente,
 Equipe de Atendimento"""
 
 
+@app.before_request
+def start_request_metrics():
+    """Marca o início da requisição e a conta como em andamento"""
+    g.metrics_started = time.perf_counter()
+    g.metrics_endpoint = request.endpoint or 'not_found'
+    requests_in_progress.inc(endpoint=g.metrics_endpoint)
+
+
+@app.after_request
+def count_request(response):
+    requests_total.inc(endpoint=g.get('metrics_endpoint', 'not_found'), status=str(response.status_code))
+    return response
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # Executado mesmo quando a requisição termina com exceção
+    if 'metrics_started' in g:
+        requests_in_progress.dec(endpoint=g.metrics_endpoint)
+        request_seconds.observe(time.perf_counter() - g.metrics_started, endpoint=g.metrics_endpoint)
+
+
 @app.route('/')
 def index():
     """Rota principal - serve a interface web"""
     return render_template('index.html')
 
 
+def read_uploaded_file(file):
+    """
+    Extrai o texto de um arquivo enviado (.txt ou .pdf) direto do stream em memória.
+    Retorna um ExtractionResult com o texto, as páginas lidas e os erros por página.
+    """
+    return read_file_stream(file.stream, file.filename)
+
+
+def read_file_stream(stream, filename):
+    """Extrai o texto de um stream de arquivo (.txt ou .pdf); ValueError se o formato não é aceito"""
+    if not allowed_file(filename):
+        raise ValueError('Formato de arquivo não permitido. Use .txt ou .pdf')
+    
+    try:
+        with stage_seconds.time(stage='extract'):
+            return extract_text(stream, filename, EXTRACT_MAX_CHARS)
+    except ExtractionError as e:
+        raise ValueError(str(e))
+
+
+def extraction_info(extraction):
+    """Resumo da extração retornado pela API"""
+    return {
+        'pages_read': extraction.pages_read,
+        'total_pages': extraction.total_pages,
+        'truncated': extraction.truncated,
+        'errors': extraction.errors
+    }
+
+
+def build_result(text, classification, response):
+    """Monta o resultado de classificação retornado pela API"""
+    return {
+        'category': classification.category,
+        'confidence': round(classification.confidence * 100, 2),
+        'tier': classification.tier,
+        'response': response,
+        'original_text': text[:200] + '...' if len(text) > 200 else text
+    }
+
+
 @app.route('/api/classify', methods=['POST'])
 def classify():
     """Endpoint para classificar email e gerar resposta"""
@@ -312,62 +879,464 @@ def classify():
             if file.filename == '':
                 return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
             
-            if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                file.save(filepath)
-                
-                # Extrair texto do arquivo
-                if filename.endswith('.pdf'):
-                    text = extract_text_from_pdf(filepath)
-                else:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        text = f.read()
-                
-                # Remover arquivo após processamento
-                os.remove(filepath)
-            else:
-                return jsonify({'error': 'Formato de arquivo não permitido. Use .txt ou .pdf'}), 400
+            try:
+                extraction = read_uploaded_file(file)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            text = extraction.text
         
         elif 'text' in request.json:
             text = request.json['text']
+            extraction = None
         else:
             return jsonify({'error': 'Nenhum conteúdo fornecido'}), 400
         
         if not text or len(text.strip()) == 0:
             return jsonify({'error': 'Texto vazio'}), 400
         
-        # Pré-processar texto
-        processed_text = preprocess_text(text)
+        return jsonify(process_email(text, extraction))
+    
+    except Exception as e:
+        return jsonify({'error': f'Erro ao processar: {str(e)}'}), 500
+
+
+def process_email(text, extraction=None):
+    """Classifica um email, gera a resposta e monta o resultado de /api/classify"""
+    if extraction is not None:
+        # A interface não tem o texto extraído: guardado para uma eventual correção
+        result_cache.set(content_hash(text, 'email_text'), text)
+    
+    # Classificar email
+    classification = classify_email(text)
+    
+    # Gerar resposta
+    response = generate_response(text, classification.category)
+    
+    result = {
+        'success': True,
+        'email_id': content_hash(text, 'email_text'),
+        **build_result(text, classification, response)
+    }
+    if extraction is not None:
+        result['extraction'] = extraction_info(extraction)
+    return result
+
+
+@app.route('/api/classify/batch', methods=['POST'])
+def classify_batch():
+    """
+    Endpoint para classificar vários emails em uma única requisição.
+    Aceita JSON {"texts": [...]} ou multipart com vários campos "files" (e "texts").
+    Erros de um item não interrompem o lote: cada item tem seu próprio resultado.
+    """
+    try:
+        # Montar a lista de itens: [origem, texto ou None, erro ou None, extração ou None]
+        items = []
         
-        # Classificar email
-        category, confidence = classify_email(text)
+        if request.is_json:
+            data = request.get_json(silent=True) or {}
+            if not isinstance(data, dict):
+                return jsonify({'error': 'O corpo JSON deve ser um objeto'}), 400
+            texts = data.get('texts', [])
+            if not isinstance(texts, list):
+                return jsonify({'error': 'O campo "texts" deve ser uma lista'}), 400
+        else:
+            texts = request.form.getlist('texts')
         
-        # Gerar resposta
-        response = generate_response(text, category)
+        for text in texts:
+            items.append(['text', text if isinstance(text, str) else None, None, None])
         
-        return jsonify({
+        for file in request.files.getlist('files'):
+            if file.filename == '':
+                continue
+            try:
+                extraction = read_uploaded_file(file)
+                items.append([file.filename, extraction.text, None, extraction])
+            except ValueError as e:
+                items.append([file.filename, None, str(e), None])
+            except Exception as e:
+                items.append([file.filename, None, f'Erro ao ler arquivo: {str(e)}', None])
+        
+        if not items:
+            return jsonify({'error': 'Nenhum conteúdo fornecido'}), 400
+        
+        if len(items) > MAX_BATCH_ITEMS:
+            return jsonify({'error': f'Máximo de {MAX_BATCH_ITEMS} emails por lote'}), 400
+        
+        return jsonify(process_batch(items))
+    
+    except Exception as e:
+        return jsonify({'error': f'Erro ao processar lote: {str(e)}'}), 500
+
+
+def process_batch(items):
+    """
+    Classifica e responde os itens [origem, texto, erro, extração] de um lote e
+    monta o resultado de /api/classify/batch; itens com erro não interrompem o lote
+    """
+    for item in items:
+        if item[2] is None and (not item[1] or len(item[1].strip()) == 0):
+            item[2] = 'Texto vazio'
+    
+    # Classificar e gerar respostas apenas dos itens válidos, em lote
+    valid = [i for i, item in enumerate(items) if item[2] is None]
+    valid_texts = [items[i][1] for i in valid]
+    
+    classifications = classify_emails_batch(valid_texts)
+    categories = [classification.category for classification in classifications]
+    responses = generate_responses_batch(valid_texts, categories)
+    
+    results = [
+        {'index': i, 'source': source, 'success': False, 'error': error}
+        for i, (source, _, error, _) in enumerate(items)
+    ]
+    for i, text, classification, response in zip(valid, valid_texts, classifications, responses):
+        results[i] = {
+            'index': i,
+            'source': items[i][0],
             'success': True,
+            **build_result(text, classification, response)
+        }
+    for i, item in enumerate(items):
+        if item[3] is not None:
+            results[i]['extraction'] = extraction_info(item[3])
+    
+    return {
+        'success': True,
+        'total': len(results),
+        'succeeded': len(valid),
+        'failed': len(results) - len(valid),
+        'results': results
+    }
+
+
+@app.route('/api/feedback', methods=['POST'])
+def feedback():
+    """
+    Registra a correção de uma classificação feita por um operador.
+    Aceita JSON {"text" ou "email_id", "category", "predicted", "tier", "dry_run"}.
+    A correção vai para o log durável, o email corrigido passa a receber a
+    categoria informada e o classificador linear é atualizado incrementalmente.
+    Com "dry_run": true a correção é apenas validada (testes contra o servidor
+    em produção não alteram o log nem o modelo).
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            return jsonify({'error': 'O corpo JSON deve ser um objeto'}), 400
+        category = data.get('category')
+        if category not in ('Produtivo', 'Improdutivo'):
+            return jsonify({'error': 'O campo "category" deve ser Produtivo ou Improdutivo'}), 400
+        
+        text = data.get('text')
+        if not text and data.get('email_id'):
+            # Uploads: o texto extraído ficou no cache ao classificar. Só ids de
+            # email_text: outras chaves do cache (ex.: respostas geradas) não são emails
+            email_id = data['email_id']
+            if not isinstance(email_id, str) or not EMAIL_ID_PATTERN.fullmatch(email_id):
+                return jsonify({'error': 'O campo "email_id" deve ser o email_id retornado por /api/classify'}), 400
+            text = result_cache.get(email_id)
+            if isinstance(text, str) and content_hash(text, 'email_text') != email_id:
+                text = None
+        if not isinstance(text, str) or len(text.strip()) == 0:
+            return jsonify({'error': 'Texto do email não encontrado. Envie o campo "text"'}), 400
+        
+        if data.get('dry_run') is True:
+            return jsonify({'success': True, 'dry_run': True, 'model_updated': False, 'model_version': None})
+        
+        feedback_log.append({
+            'email_id': content_hash(text, 'email_text'),
             'category': category,
-            'confidence': round(confidence * 100, 2),
-            'response': response,
-            'original_text': text[:200] + '...' if len(text) > 200 else text
+            'predicted': data.get('predicted'),
+            'tier': data.get('tier'),
+            'text': text
+        })
+        feedback_total.inc(category=category)
+        
+        # Reclassificações do mesmo email usam a correção, e não o resultado antigo do cache
+        result_cache.set(content_hash(text, 'classify'), [category, 1.0, 'feedback'])
+        
+        store = model_manager.get('linear')
+        model = None
+        if store is not None:
+            model = store.update([text], [1 if category == 'Produtivo' else 0], FEEDBACK_LEARNING_RATE)
+        
+        return jsonify({
+            'success': True,
+            'model_updated': model is not None,
+            'model_version': model.version if model is not None else None
         })
     
     except Exception as e:
-        return jsonify({'error': f'Erro ao processar: {str(e)}'}), 500
+        return jsonify({'error': f'Erro ao registrar correção: {str(e)}'}), 500
+
+
+def run_job(job):
+    """Executa um job da fila; o resultado é o mesmo de /api/classify ou /api/classify/batch"""
+    payload = job['payload']
+    
+    if job['kind'] == 'classify':
+        if job['files']:
+            filename, data = job['files'][0]
+            try:
+                extraction = read_file_stream(io.BytesIO(data), filename)
+            except ValueError as e:
+                return {'success': False, 'error': str(e)}
+            text = extraction.text
+        else:
+            text, extraction = payload.get('text'), None
+        if not text or len(text.strip()) == 0:
+            return {'success': False, 'error': 'Texto vazio'}
+        return process_email(text, extraction)
+    
+    items = [['text', text if isinstance(text, str) else None, None, None] for text in payload.get('texts', [])]
+    for filename, data in job['files']:
+        try:
+            extraction = read_file_stream(io.BytesIO(data), filename)
+            items.append([filename, extraction.text, None, extraction])
+        except ValueError as e:
+            items.append([filename, None, str(e), None])
+    return process_batch(items)
+
+
+# Threads que consomem a fila neste processo (iniciadas na primeira requisição de cada worker)
+job_pool = JobWorkerPool(job_queue, run_job, workers=JOBS_WORKERS)
+
+
+def start_job_workers():
+    """
+    Inicia os consumidores da fila no processo que atende as requisições, retomando
+    os jobs que ficaram na fila após um reinício. O gunicorn chama esta função em
+    cada worker (post_worker_init em gunicorn.conf.py) e os servidores de
+    desenvolvimento, antes de app.run(); scripts que só importam a aplicação
+    (bulk.py, tests/benchmark.py) não consomem a fila.
+    """
+    job_pool.ensure_started()
+
+
+@app.before_request
+def ensure_job_workers():
+    # Outros servidores WSGI: inicia na primeira requisição
+    job_pool.ensure_started()
+
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """
+    Enfileira uma classificação e responde na hora com o id do job (202).
+    Aceita o mesmo conteúdo de /api/classify (JSON {"text"} ou multipart "file")
+    ou de /api/classify/batch (JSON {"texts"} ou multipart "files"/"texts"),
+    mais um campo opcional "priority" (inteiro; maior sai primeiro).
+    """
+    try:
+        data = (request.get_json(silent=True) or {}) if request.is_json else request.form
+        if not isinstance(data, dict):
+            return jsonify({'error': 'O corpo JSON deve ser um objeto'}), 400
+        try:
+            priority = int(data.get('priority', 0))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'O campo "priority" deve ser um inteiro'}), 400
+        
+        files = []
+        for field in ('file', 'files'):
+            for file in request.files.getlist(field):
+                if file.filename == '':
+                    continue
+                if not allowed_file(file.filename):
+                    return jsonify({'error': f'Formato de arquivo não permitido: {file.filename}. Use .txt ou .pdf'}), 400
+                files.append((file.filename, file.read()))
+        
+        if 'texts' in data or 'files' in request.files:
+            texts = data.get('texts', []) if request.is_json else request.form.getlist('texts')
+            if not isinstance(texts, list):
+                return jsonify({'error': 'O campo "texts" deve ser uma lista'}), 400
+            if not texts and not files:
+                return jsonify({'error': 'Nenhum conteúdo fornecido'}), 400
+            if len(texts) + len(files) > MAX_BATCH_ITEMS:
+                return jsonify({'error': f'Máximo de {MAX_BATCH_ITEMS} emails por lote'}), 400
+            job_id = job_queue.enqueue('batch', {'texts': texts}, files, priority)
+        elif files:
+            job_id = job_queue.enqueue('classify', {}, files[:1], priority)
+        else:
+            text = data.get('text')
+            if not isinstance(text, str) or len(text.strip()) == 0:
+                return jsonify({'error': 'Nenhum conteúdo fornecido' if text is None else 'Texto vazio'}), 400
+            job_id = job_queue.enqueue('classify', {'text': text}, (), priority)
+        
+        job_pool.notify()
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': f'/api/jobs/{job_id}'
+        }), 202
+    
+    except Exception as e:
+        return jsonify({'error': f'Erro ao criar job: {str(e)}'}), 500
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Estado do job (queued, running, done ou failed) e, quando concluído, o resultado"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    return jsonify(job)
+
+
+def embedding_stats():
+    """Categorias e cache do estágio semântico, ou None se ele não estiver carregado"""
+    classifier = model_manager.get('embeddings')
+    if classifier is None:
+        return None
+    return {'categories': classifier.categories, 'cache': classifier.cache.stats()}
 
 
 @app.route('/api/health', methods=['GET'])
 def health():
     """Endpoint de health check"""
+    token_stage = current_token_stage()
     return jsonify({
         'status': 'healthy',
-        'classifier_loaded': classifier is not None,
-        'openai_configured': openai_api_key is not None
+        'ready': model_manager.all_ready(),
+        'components': model_manager.status(),
+        'classifier_loaded': model_manager.is_ready('classifier'),
+        'inference_backend': getattr(model_manager.get('classifier'), 'name', None),
+        'linear_model': getattr(current_linear_model(), 'version', None),
+        'linear_calibration': linear_stats(),
+        'preprocess_cache': current_preprocessor().cache_info(),
+        'tokenization': token_stage.stats() if token_stage else None,
+        'embeddings': embedding_stats(),
+        'semantic_cache': semantic_cache.stats() if semantic_cache else None,
+        'llm_circuit': llm_breaker.stats(),
+        'feedback': feedback_log.stats(),
+        'jobs': {**job_queue.stats(), **job_pool.stats()},
+        'openai_configured': openai_api_key is not None,
+        'cascade_tiers': cascade.stats(),
+        'cache': result_cache.stats(),
+        'single_flight': inflight.stats(),
+        'inference_scheduler': inference_scheduler.stats(),
+        'llm': llm_service.stats()
     })
 
 
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 quando todos os componentes estão carregados, 503 caso contrário"""
+    is_ready = model_manager.all_ready()
+    return jsonify({
+        'ready': is_ready,
+        'components': model_manager.status()
+    }), 200 if is_ready else 503
+
+
+def collect_component_metrics():
+    """Estatísticas dos componentes, lidas a cada scrape de /api/metrics"""
+    components = model_manager.status()
+    scheduler_stats = inference_scheduler.stats()
+    cache_stats = result_cache.stats()
+    single_flight_stats = inflight.stats()
+    llm_stats = llm_service.stats()
+    circuit_stats = llm_breaker.stats()
+    embedding_cache_stats = (embedding_stats() or {}).get('cache', {'hits': 0, 'misses': 0})
+    semantic_stats = semantic_cache.stats() if semantic_cache else {'hits': 0, 'misses': 0, 'stale': 0, 'entries': 0}
+    job_counts = job_queue.stats()
+    
+    # O agendador conta cada lote só no primeiro bucket; no Prometheus os buckets são cumulativos
+    batch_buckets = []
+    cumulative = 0
+    for bucket, count in scheduler_stats['batch_size_histogram'].items():
+        cumulative += count
+        batch_buckets.append(('email_inference_batch_size_bucket', {'le': bucket}, cumulative))
+    
+    return [
+        ('email_model_load_seconds', 'gauge', 'Tempo de carga de cada componente', [
+            ('email_model_load_seconds', {'component': name}, info['load_seconds'])
+            for name, info in components.items() if info['load_seconds'] is not None
+        ]),
+        ('email_model_ready', 'gauge', 'Componente carregado (1) ou não (0)', [
+            ('email_model_ready', {'component': name}, int(info['status'] == 'ready'))
+            for name, info in components.items()
+        ]),
+        ('email_cascade_decisions_total', 'counter', 'Emails decididos por cada estágio da cascata', [
+            ('email_cascade_decisions_total', {'tier': tier}, count)
+            for tier, count in cascade.stats().items()
+        ]),
+        ('email_inference_queue_depth', 'gauge', 'Textos aguardando o agendador de inferência', [
+            ('email_inference_queue_depth', {}, scheduler_stats['queue_depth'])
+        ]),
+        ('email_inference_batch_size', 'histogram', 'Tamanho dos lotes executados pelo modelo', batch_buckets + [
+            ('email_inference_batch_size_sum', {}, scheduler_stats['items']),
+            ('email_inference_batch_size_count', {}, scheduler_stats['batches'])
+        ]),
+        ('email_inference_errors_total', 'counter', 'Lotes do agendador que falharam', [
+            ('email_inference_errors_total', {}, scheduler_stats['errors'])
+        ]),
+        ('email_cache_requests_total', 'counter', 'Consultas ao cache de resultados', [
+            ('email_cache_requests_total', {'result': 'hit'}, cache_stats['hits']),
+            ('email_cache_requests_total', {'result': 'miss'}, cache_stats['misses'])
+        ]),
+        ('email_cache_entries', 'gauge', 'Entradas no cache de resultados', [
+            ('email_cache_entries', {}, cache_stats.get('entries', 0))
+        ]),
+        ('email_cache_bytes', 'gauge', 'Tamanho do cache de resultados em bytes', [
+            ('email_cache_bytes', {}, cache_stats.get('bytes', 0))
+        ]),
+        ('email_embedding_cache_requests_total', 'counter', 'Consultas ao cache de embeddings do estágio semântico', [
+            ('email_embedding_cache_requests_total', {'result': 'hit'}, embedding_cache_stats['hits']),
+            ('email_embedding_cache_requests_total', {'result': 'miss'}, embedding_cache_stats['misses'])
+        ]),
+        ('email_semantic_cache_requests_total', 'counter', 'Consultas ao cache semântico de respostas', [
+            ('email_semantic_cache_requests_total', {'result': 'hit'}, semantic_stats['hits']),
+            ('email_semantic_cache_requests_total', {'result': 'miss'}, semantic_stats['misses'])
+        ]),
+        ('email_semantic_cache_stale_total', 'counter', 'Respostas descartadas do cache semântico por TTL ou reutilização', [
+            ('email_semantic_cache_stale_total', {}, semantic_stats['stale'])
+        ]),
+        ('email_semantic_cache_entries', 'gauge', 'Respostas no cache semântico', [
+            ('email_semantic_cache_entries', {}, semantic_stats['entries'])
+        ]),
+        ('email_single_flight_calls_total', 'counter', 'Chamadas executadas e compartilhadas pelo single-flight', [
+            ('email_single_flight_calls_total', {'result': 'executed'}, single_flight_stats['executed']),
+            ('email_single_flight_calls_total', {'result': 'shared'}, single_flight_stats['shared'])
+        ]),
+        ('email_single_flight_in_progress', 'gauge', 'Cálculos em andamento no single-flight', [
+            ('email_single_flight_in_progress', {}, single_flight_stats['in_flight'])
+        ]),
+        ('email_llm_calls_total', 'counter', 'Chamadas à OpenAI por resultado', [
+            ('email_llm_calls_total', {'result': 'attempt'}, llm_stats['calls']),
+            ('email_llm_calls_total', {'result': 'retry'}, llm_stats['retries']),
+            ('email_llm_calls_total', {'result': 'failure'}, llm_stats['failures']),
+            ('email_llm_calls_total', {'result': 'timeout'}, llm_stats['timeouts'])
+        ]),
+        ('email_llm_in_progress', 'gauge', 'Chamadas à OpenAI em andamento', [
+            ('email_llm_in_progress', {}, llm_stats['active'])
+        ]),
+        ('email_llm_circuit_state', 'gauge', 'Estado do circuit breaker da OpenAI (1 no estado atual)', [
+            ('email_llm_circuit_state', {'state': state}, int(circuit_stats['state'] == state))
+            for state in ('closed', 'open', 'half_open')
+        ]),
+        ('email_llm_circuit_opened_total', 'counter', 'Aberturas do circuit breaker da OpenAI', [
+            ('email_llm_circuit_opened_total', {}, circuit_stats['opened'])
+        ]),
+        ('email_llm_circuit_rejected_total', 'counter', 'Chamadas recusadas com o circuito aberto', [
+            ('email_llm_circuit_rejected_total', {}, circuit_stats['rejected'])
+        ]),
+        ('email_jobs', 'gauge', 'Jobs na fila assíncrona por estado (compartilhada pelos workers)', [
+            ('email_jobs', {'status': status}, count) for status, count in job_counts.items()
+        ])
+    ]
+
+
+metrics_registry.add_collector(collect_component_metrics)
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Métricas deste processo no formato de texto do Prometheus"""
+    return app.response_class(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == '__main__':
     print("\n" + "=" * 60)
     print("🚀 Iniciando servidor Flask...")
@@ -381,7 +1350,8 @@ if __name__ == '__main__':
     print("=" * 60 + "\n")
     
     try:
-        app.run(debug=True, host='127.0.0.1', port=port, use_reloader=False)
+        start_job_workers()
+        app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='127.0.0.1', port=port, use_reloader=False)
     except Exception as e:
         print(f"\n❌ Erro ao iniciar servidor: {e}")
         import traceback
@@ -0,0 +1,198 @@
+"""
+Métricas da aplicação no formato de texto do Prometheus.
+
+Contadores, gauges e histogramas ficam em memória e são atualizados com uma
+única operação protegida por lock, barata o suficiente para ficar sempre ligada.
+O texto só é montado quando /api/metrics é consultado; nesse momento os
+coletores registrados também leem as estatísticas dos demais componentes
+(agendador, cache, cliente OpenAI, carga dos modelos).
+
+As métricas são por processo: com vários workers do gunicorn, cada scrape
+enxerga apenas o worker que atendeu a requisição.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites (em segundos) pensados para etapas entre ~1ms (palavras-chave) e ~20s (OpenAI)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple([labels[name] for name in self.labelnames])
+        except KeyError:
+            pass
+        raise ValueError(f"Métrica '{self.name}' espera os rótulos {self.labelnames}")
+
+    def _labels(self, key, **extra):
+        return tuple(zip(self.labelnames, key)) + tuple(extra.items())
+
+    def samples(self):
+        """Gera (nome, rótulos, valor) para cada série"""
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, self._labels(key), value
+
+
+class Counter(_Metric):
+    """Valor que só aumenta (ex.: quantidade de fallbacks)"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Valor que sobe e desce (ex.: requisições em andamento)"""
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """Distribuição de durações em faixas fixas; cada observação custa uma busca binária"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Contagem por faixa (não cumulativa) + faixa +Inf, soma
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Mede a duração do bloco, inclusive quando ele levanta uma exceção"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield self.name + '_bucket', self._labels(key, le=_format_value(bound)), cumulative
+            yield self.name + '_sum', self._labels(key), total
+            yield self.name + '_count', self._labels(key), cumulative
+
+
+class Registry:
+    """Conjunto de métricas e coletores exportados juntos"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect):
+        """
+        Registra uma função chamada a cada scrape. Ela retorna uma lista de famílias
+        (nome, tipo, descrição, [(nome da série, rótulos, valor), ...]) com valores lidos na hora.
+        """
+        self._collectors.append(collect)
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        families = [
+            (metric.name, metric.type, metric.documentation, metric.samples())
+            for metric in self._metrics
+        ]
+        for collect in self._collectors:
+            try:
+                families.extend(collect())
+            except Exception as e:
+                # Um componente com erro não derruba o scrape inteiro
+                print(f"Erro no coletor de métricas {getattr(collect, '__name__', collect)}: {e}")
+
+        lines = []
+        for name, metric_type, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for sample_name, labels, value in samples:
+                if isinstance(labels, dict):
+                    labels = tuple(labels.items())
+                lines.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
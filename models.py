@@ -0,0 +1,113 @@
+"""
+Gerenciador de recursos pesados (modelos de IA, corpora do NLTK).
+
+Os componentes são registrados com uma função de carga e carregados em uma
+thread em segundo plano, para que importar a aplicação seja instantâneo. Enquanto
+um componente não está pronto, get() retorna None e quem o usa deve recorrer ao
+seu fallback (ex.: classificação por palavras-chave).
+"""
+import os
+import threading
+import time
+
+PENDING = 'pending'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class ModelManager:
+    """Carrega componentes sob demanda ou em segundo plano e informa o estado de cada um"""
+
+    def __init__(self):
+        self._components = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def register(self, name, loader):
+        """Registra um componente; loader() retorna o objeto carregado"""
+        self._components[name] = {
+            'loader': loader,
+            'status': PENDING,
+            'value': None,
+            'error': None,
+            'load_seconds': None,
+            'ready': threading.Event()
+        }
+
+    def start(self):
+        """Inicia a carga de todos os componentes pendentes em segundo plano"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid is not None and self._pid != os.getpid():
+                self._reset_after_fork()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self.load_all, name='model-loader', daemon=True)
+            self._thread.start()
+
+    def load_all(self):
+        """Carrega todos os componentes pendentes, em ordem de registro (bloqueante)"""
+        for name in self._components:
+            self.load(name)
+
+    def load(self, name):
+        """Carrega um componente, se ainda não foi carregado (bloqueante)"""
+        component = self._components[name]
+        with self._lock:
+            if component['status'] != PENDING:
+                return component['value']
+            component['status'] = LOADING
+
+        print(f"Carregando componente '{name}'...")
+        started = time.perf_counter()
+        try:
+            component['value'] = component['loader']()
+            component['status'] = READY
+            print(f"Componente '{name}' pronto!")
+        except Exception as e:
+            component['error'] = str(e)
+            component['status'] = FAILED
+            print(f"Erro ao carregar componente '{name}': {e}")
+        component['load_seconds'] = round(time.perf_counter() - started, 3)
+        component['ready'].set()
+        return component['value']
+
+    def _reset_after_fork(self):
+        """A thread de carga não sobrevive ao fork: componentes em carga voltam a pendentes"""
+        for component in self._components.values():
+            if component['status'] == LOADING:
+                component['status'] = PENDING
+
+    def get(self, name):
+        """Retorna o componente se estiver pronto, senão None (sem bloquear)"""
+        component = self._components.get(name)
+        return component['value'] if component and component['status'] == READY else None
+
+    def wait(self, name, timeout=None):
+        """Aguarda a carga do componente e o retorna (None se falhou, expirou ou não foi registrado)"""
+        component = self._components.get(name)
+        if component is None:
+            return None
+        component['ready'].wait(timeout)
+        return self.get(name)
+
+    def is_ready(self, name):
+        """Componentes não registrados (desligados na configuração) nunca ficam prontos"""
+        component = self._components.get(name)
+        return component is not None and component['status'] == READY
+
+    def all_ready(self):
+        return all(component['status'] == READY for component in self._components.values())
+
+    def status(self):
+        """Estado de cada componente: pending, loading, ready ou failed"""
+        return {
+            name: {
+                'status': component['status'],
+                'load_seconds': component['load_seconds'],
+                'error': component['error']
+            }
+            for name, component in self._components.items()
+        }
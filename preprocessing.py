@@ -0,0 +1,70 @@
+"""
+Pré-processamento de texto: tokenização, remoção de stop words e lematização.
+
+A tokenização é uma única expressão regular compilada (sequências de 3 ou mais
+caracteres de palavra, o mesmo que a remoção de pontuação + word_tokenize +
+filtro de tamanho faziam). Cada token distinto passa uma única vez pela
+checagem de stop words e pelo lematizador: o resultado fica em um cache LRU
+limitado. O vocabulário dos emails é pequeno, então quase todos os tokens
+acertam o cache e o custo por email fica próximo ao da própria regex.
+
+O pré-processamento não faz parte do caminho das rotas: roda apenas quando quem
+precisa do texto processado chama process() / process_batch().
+"""
+import re
+from functools import lru_cache
+
+_TOKEN = re.compile(r'\w{3,}')
+
+
+def tokenize(text):
+    """Tokens em minúsculas com 3 ou mais caracteres, sem pontuação"""
+    return _TOKEN.findall(text.lower())
+
+
+class Preprocessor:
+    """Tokenizador compilado com cache de lemas e de stop words"""
+
+    def __init__(self, lemmatize=None, stop_words=(), cache_size=100000):
+        self.stop_words = frozenset(stop_words)
+        self._lemmatize = lemmatize
+        self.normalize_token = lru_cache(maxsize=cache_size)(self._normalize_token)
+
+    def _normalize_token(self, token):
+        """Lema do token, ou None para stop words"""
+        if token in self.stop_words:
+            return None
+        if self._lemmatize is None:
+            return token
+        try:
+            return self._lemmatize(token)
+        except LookupError:
+            # Corpus do WordNet indisponível: mantém o token
+            return token
+
+    def process(self, text):
+        """Texto pré-processado: lemas separados por espaço"""
+        return ' '.join(lemma for lemma in map(self.normalize_token, tokenize(text)) if lemma is not None)
+
+    def process_batch(self, texts):
+        """
+        Pré-processa vários textos. Tokens repetidos entre os textos do lote já são
+        resolvidos pelo cache (lookup em C); montar um vocabulário do lote em Python
+        mediu mais lento que isso.
+        """
+        normalize = self.normalize_token
+        return [
+            ' '.join(lemma for lemma in map(normalize, tokenize(text)) if lemma is not None)
+            for text in texts
+        ]
+
+    def cache_info(self):
+        info = self.normalize_token.cache_info()
+        total = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': round(info.hits / total, 4) if total else 0.0,
+            'entries': info.currsize,
+            'max_entries': info.maxsize
+        }
@@ -8,7 +8,7 @@ import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 try:
-    from main import app
+    from main import app, start_job_workers
     print("=" * 50)
     print("🚀 Iniciando servidor Flask...")
     print("=" * 50)
@@ -17,7 +17,9 @@ try:
     print("=" * 50)
     
     port = int(os.environ.get('PORT', 5000))
-    app.run(debug=True, host='0.0.0.0', port=port, use_reloader=False)
+    # Servidor de desenvolvimento; em produção use o gunicorn (gunicorn.conf.py)
+    start_job_workers()
+    app.run(debug=os.getenv('FLASK_DEBUG') == '1', host='0.0.0.0', port=port, use_reloader=False)
 except Exception as e:
     print(f"❌ Erro ao iniciar: {e}")
     import traceback
@@ -0,0 +1,137 @@
+"""
+Agendador de inferência com micro-batching dinâmico.
+
+Uma única thread em segundo plano é dona do modelo. As threads das requisições
+enfileiram entradas (na aplicação, os ids já tokenizados de cada texto ou janela,
+veja tokenization.py) e recebem um Future; a thread de inferência junta os pedidos
+que chegam dentro de uma janela curta (max_wait_ms) até max_batch_size e
+executa todos em um único forward pass com padding.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# Limites dos buckets do histograma de tamanho de lote
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+class InferenceScheduler:
+    """Agrupa pedidos concorrentes de inferência em lotes"""
+
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0):
+        """
+        Args:
+            predict_fn (callable): lista de entradas do lote, na ordem de chegada (as
+                mesmas passadas a submit/predict; em main.py, arrays de ids sem tokens
+                especiais) -> lista de resultados, na mesma ordem.
+            max_batch_size (int): Máximo de entradas por forward pass.
+            max_wait_ms (float): Tempo máximo de espera por mais pedidos após o primeiro.
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.max_observed_batch = 0
+        self.inference_seconds = 0.0
+        self.batch_size_counts = dict.fromkeys(BATCH_SIZE_BUCKETS + (float('inf'),), 0)
+
+    def _ensure_started(self):
+        """Inicia a thread na primeira utilização (e novamente após um fork)"""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Threads não sobrevivem ao fork: descartar a fila herdada
+                self._queue = queue.Queue()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='inference-scheduler', daemon=True)
+            self._thread.start()
+
+    def submit(self, inputs):
+        """Enfileira a entrada de um pedido (em main.py, os ids de um texto) e retorna um Future com o resultado"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((inputs, future))
+        return future
+
+    def submit_many(self, items):
+        """Enfileira várias entradas de uma vez"""
+        return [self.submit(inputs) for inputs in items]
+
+    def predict(self, items, timeout=None):
+        """Enfileira as entradas e aguarda todos os resultados"""
+        return [future.result(timeout) for future in self.submit_many(items)]
+
+    def _collect(self):
+        """Bloqueia até o primeiro pedido e junta os que chegarem dentro da janela"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Descartar pedidos cancelados antes de rodar o modelo
+            batch = [(inputs, future) for inputs, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = self.predict_fn([inputs for inputs, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+                failed = False
+            except Exception as e:
+                failed = True
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self._record(len(batch), time.perf_counter() - started, failed)
+
+    def _record(self, size, elapsed, failed=False):
+        with self._lock:
+            if failed:
+                self.errors += 1
+            self.batches += 1
+            self.items += size
+            self.inference_seconds += elapsed
+            self.max_observed_batch = max(self.max_observed_batch, size)
+            for bucket in self.batch_size_counts:
+                if size <= bucket:
+                    self.batch_size_counts[bucket] += 1
+                    break
+
+    def stats(self):
+        """Profundidade da fila e distribuição dos tamanhos de lote"""
+        with self._lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'batches': self.batches,
+                'items': self.items,
+                'errors': self.errors,
+                'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+                'max_batch_size': self.max_observed_batch,
+                'avg_batch_ms': round(self.inference_seconds * 1000 / self.batches, 2) if self.batches else 0.0,
+                'batch_size_histogram': {
+                    ('+Inf' if bucket == float('inf') else str(bucket)): count
+                    for bucket, count in self.batch_size_counts.items()
+                }
+            }
@@ -0,0 +1,203 @@
+"""
+Cache semântico de respostas geradas pela OpenAI.
+
+A maior parte dos emails produtivos é uma paráfrase de poucas dezenas de
+pedidos (status de uma solicitação, envio de documentos, segunda via...). O
+cache exato (cache.py) só acerta quando o texto é idêntico; este cache guarda o
+embedding de cada email já respondido e reutiliza a resposta quando um email
+novo da mesma categoria é suficientemente parecido (similaridade de cosseno
+acima do limiar).
+
+O índice é uma matriz NumPy plana (entradas x dimensão): cada consulta é uma
+multiplicação matriz-vetor, o suficiente para alguns milhares de entradas.
+
+Controle de desatualização:
+- ttl: entradas mais antigas são descartadas;
+- max_reuses: após N reutilizações a resposta é gerada de novo, para que
+  mudanças no prompt ou no modelo cheguem às respostas mais frequentes;
+- clear(): descarta tudo (ex.: após mudar o prompt).
+
+Personalização: números de protocolo/cliente e o nome de quem assinou o email
+original são trocados pelos do email novo. Se a resposta cita um dado do email
+original que não tem correspondente no novo, ela não é reutilizada.
+"""
+import re
+import threading
+import time
+
+import numpy as np
+
+_NUMBER = re.compile(r'\b\d{4,}\b')
+_CLOSING = re.compile(
+    r'^\s*(?:atenciosamente|att\.?|abraços?|obrigad[oa]s?|grat[oa]|cordialmente|saudações)[\s,.!]*$',
+    re.IGNORECASE | re.MULTILINE
+)
+_NAME = re.compile(r'^[A-ZÀ-Ý][a-zà-ÿ]+(?: (?:d[aeo]s? )?[A-ZÀ-Ý][a-zà-ÿ]+){0,3}$')
+
+
+def extract_entities(text):
+    """Dados que tornam uma resposta específica de um email: números longos e o nome na assinatura"""
+    numbers = list(dict.fromkeys(_NUMBER.findall(text)))
+
+    name = None
+    closings = list(_CLOSING.finditer(text))
+    if closings:
+        for line in text[closings[-1].end():].splitlines():
+            line = line.strip()
+            if line:
+                name = line if _NAME.match(line) else None
+                break
+    return {'numbers': numbers, 'name': name}
+
+
+def personalize(response, source, target):
+    """
+    Adapta a resposta do email de origem ao email alvo, ou retorna None quando
+    a resposta cita um dado do email de origem sem equivalente no alvo.
+    """
+    replacements = {}
+    numbers_used = [number for number in source['numbers'] if re.search(rf'\b{number}\b', response)]
+    if numbers_used:
+        # Só é seguro trocar quando os dois emails têm a mesma quantidade de identificadores
+        if len(source['numbers']) != len(target['numbers']):
+            return None
+        mapping = dict(zip(source['numbers'], target['numbers']))
+        replacements.update({number: mapping[number] for number in numbers_used})
+
+    if source['name'] and source['name'] in response:
+        if not target['name']:
+            return None
+        replacements[source['name']] = target['name']
+
+    if not replacements:
+        return response
+    pattern = re.compile('|'.join(rf'\b{re.escape(value)}\b' for value in sorted(replacements, key=len, reverse=True)))
+    return pattern.sub(lambda match: replacements[match.group(0)], response)
+
+
+class SemanticResponseCache:
+    """Índice plano de embeddings de emails respondidos, separado por categoria"""
+
+    def __init__(self, threshold=0.92, max_entries=5000, ttl=7 * 24 * 60 * 60, max_reuses=50, personalization=True):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_reuses = max_reuses
+        self.personalization = personalization
+
+        self._lock = threading.Lock()
+        self._vectors = None  # Alocada na primeira inserção, quando a dimensão é conhecida
+        self._size = 0  # Linhas já usadas da matriz
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._category_ids = np.full(max_entries, -1, dtype=np.int32)
+        self._created_at = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._reuses = np.zeros(max_entries, dtype=np.int32)
+        self._entries = [None] * max_entries  # (resposta, entidades do email de origem)
+        self._categories = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.rejected = 0
+        self._similarity_sum = 0.0
+
+    def lookup(self, vector, category, text):
+        """Resposta reutilizável para o email (embedding normalizado), ou None"""
+        with self._lock:
+            row = self._nearest(vector, category)
+            if row is None:
+                self.misses += 1
+                return None
+
+            index, similarity = row
+            response, source = self._entries[index]
+            if self.personalization:
+                response = personalize(response, source, extract_entities(text))
+                if response is None:
+                    self.rejected += 1
+                    self.misses += 1
+                    return None
+
+            self._reuses[index] += 1
+            self._last_used[index] = time.time()
+            self.hits += 1
+            self._similarity_sum += similarity
+            return response
+
+    def _nearest(self, vector, category):
+        """(linha, similaridade) da entrada válida mais próxima acima do limiar; descarta entradas vencidas"""
+        category_id = self._categories.get(category)
+        if self._vectors is None or category_id is None:
+            return None
+
+        size = self._size
+        candidates = self._valid[:size] & (self._category_ids[:size] == category_id)
+        expired = candidates & (time.time() - self._created_at[:size] > self.ttl)
+        if expired.any():
+            self._invalidate(np.flatnonzero(expired))
+            candidates &= ~expired
+        if not candidates.any():
+            return None
+
+        similarities = self._vectors[:size] @ vector
+        similarities[~candidates] = -np.inf
+        index = int(similarities.argmax())
+        if similarities[index] < self.threshold:
+            return None
+
+        if self._reuses[index] >= self.max_reuses:
+            # Resposta muito reutilizada: força uma nova geração, que ocupa o lugar desta
+            self._invalidate([index])
+            return None
+        return index, float(similarities[index])
+
+    def _invalidate(self, indexes):
+        for index in indexes:
+            self._valid[index] = False
+            self._entries[index] = None
+            self.stale += 1
+
+    def add(self, vector, category, text, response):
+        """Registra a resposta gerada para o email"""
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            if self._size < self.max_entries:
+                index = self._size
+                self._size += 1
+            else:
+                free = np.flatnonzero(~self._valid)
+                # Sem linhas livres: substitui a entrada usada há mais tempo
+                index = int(free[0]) if len(free) else int(self._last_used.argmin())
+
+            now = time.time()
+            self._vectors[index] = vector
+            self._valid[index] = True
+            self._category_ids[index] = self._categories.setdefault(category, len(self._categories))
+            self._created_at[index] = now
+            self._last_used[index] = now
+            self._reuses[index] = 0
+            self._entries[index] = (response, extract_entities(text))
+
+    def clear(self):
+        with self._lock:
+            self._valid[:] = False
+            self._entries = [None] * self.max_entries
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'stale': self.stale,
+                'rejected': self.rejected,
+                'mean_hit_similarity': round(self._similarity_sum / self.hits, 4) if self.hits else None,
+                'entries': int(self._valid[:self._size].sum()),
+                'threshold': self.threshold
+            }
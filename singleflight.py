@@ -0,0 +1,89 @@
+"""
+Deduplicação de chamadas concorrentes idênticas (single-flight).
+
+Quando várias requisições com a mesma chave chegam ao mesmo tempo, apenas a
+primeira executa o cálculo; as demais aguardam e recebem o mesmo resultado
+(ou a mesma exceção). Existe uma versão para threads e outra para asyncio.
+"""
+import asyncio
+import threading
+
+
+class _Call:
+    """Cálculo em andamento compartilhado pelas threads que aguardam"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Single-flight para threads de um mesmo processo"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Executa fn() uma única vez por chave entre as chamadas concorrentes"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        with self._lock:
+            return {'executed': self.executed, 'shared': self.shared, 'in_flight': len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """Single-flight para corrotinas de um mesmo event loop"""
+
+    def __init__(self):
+        self._calls = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, coro_fn):
+        """Aguarda coro_fn() uma única vez por chave entre as chamadas concorrentes"""
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            # shield: o cancelamento de um chamador não cancela o cálculo dos demais
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(coro_fn())
+        self._calls[key] = future
+        self.executed += 1
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self):
+        return {'executed': self.executed, 'shared': self.shared, 'in_flight': len(self._calls)}
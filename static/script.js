@@ -12,6 +12,8 @@ const responseContent = document.getElementById('responseContent');
 const previewBox = document.getElementById('previewBox');
 const copyBtn = document.getElementById('copyBtn');
 const newAnalysisBtn = document.getElementById('newAnalysisBtn');
+const feedbackBtn = document.getElementById('feedbackBtn');
+const feedbackLabel = document.getElementById('feedbackLabel');
 const historyList = document.getElementById('historyList');
 const toast = document.getElementById('toast');
 
@@ -22,6 +24,9 @@ const tabContents = document.querySelectorAll('.tab-content');
 // Histórico
 let history = JSON.parse(localStorage.getItem('emailHistory')) || [];
 
+// Análise exibida, para o envio de correções
+let currentResult = null;
+
 // Inicialização
 document.addEventListener('DOMContentLoaded', () => {
     setupTabs();
@@ -172,6 +177,15 @@ analyzeBtn.addEventListener('click', async () => {
         // Salvar no histórico
         addToHistory(data);
         
+        // Uploads não têm o texto no navegador: a correção usa o email_id
+        setFeedbackTarget({
+            text: activeTab === 'upload' ? null : textInput.value.trim(),
+            emailId: data.email_id,
+            category: data.category,
+            tier: data.tier,
+            historyId: history[0].id
+        });
+        
         showToast('Análise concluída com sucesso!', 'success');
         
     } catch (error) {
@@ -204,6 +218,68 @@ function displayResults(data) {
     resultsSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
 }
 
+// Correção da classificação
+function setFeedbackTarget(result) {
+    currentResult = result;
+    
+    if (!result) {
+        feedbackBtn.style.display = 'none';
+        return;
+    }
+    
+    const other = result.category === 'Produtivo' ? 'Improdutivo' : 'Produtivo';
+    feedbackLabel.textContent = `Classificação incorreta? Marcar como ${other}`;
+    feedbackBtn.disabled = false;
+    feedbackBtn.style.display = 'inline-flex';
+}
+
+feedbackBtn.addEventListener('click', async () => {
+    if (!currentResult) return;
+    
+    const corrected = currentResult.category === 'Produtivo' ? 'Improdutivo' : 'Produtivo';
+    feedbackBtn.disabled = true;
+    
+    try {
+        const response = await fetch('/api/feedback', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                text: currentResult.text,
+                email_id: currentResult.emailId,
+                category: corrected,
+                predicted: currentResult.category,
+                tier: currentResult.tier
+            })
+        });
+        
+        const data = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(data.error || 'Erro ao registrar correção');
+        }
+        
+        // Atualizar a categoria exibida e o histórico
+        categoryBadge.textContent = corrected;
+        categoryBadge.className = `category-badge ${corrected.toLowerCase()}`;
+        const item = history.find(h => h.id === currentResult.historyId);
+        if (item) {
+            item.category = corrected;
+            localStorage.setItem('emailHistory', JSON.stringify(history));
+            loadHistory();
+        }
+        
+        setFeedbackTarget(null);
+        showToast(data.model_updated ? 'Correção registrada e modelo atualizado!' : 'Correção registrada!', 'success');
+        
+    } catch (error) {
+        feedbackBtn.disabled = false;
+        showToast(`Erro: ${error.message}`, 'error');
+        console.error('Erro:', error);
+    }
+});
+
 // Copiar resposta
 copyBtn.addEventListener('click', () => {
     const text = responseContent.textContent;
@@ -223,6 +299,7 @@ newAnalysisBtn.addEventListener('click', () => {
     fileName.textContent = '';
     fileName.classList.remove('show');
     textInput.value = '';
+    setFeedbackTarget(null);
     checkInputs();
     
     // Voltar para o topo
@@ -280,6 +357,7 @@ function loadHistoryItem(id) {
         response: item.response,
         original_text: item.preview
     });
+    setFeedbackTarget(null);
     
     showToast('Item do histórico carregado', 'success');
 }
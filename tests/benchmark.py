@@ -0,0 +1,239 @@
+"""
+Micro-benchmarks das etapas do pipeline, sem rede.
+
+Mede preprocess_text (um texto e o lote inteiro), classify_with_keywords, o classificador linear (se houver
+um modelo treinado), o classificador semântico (se 'embeddings' estiver em
+CASCADE_TIERS), classify_email (com o modelo e apenas com o fallback),
+a tokenização do modelo (TokenizationStage.encode), extract_text_from_pdf e a geração por template sobre
+corpora sintéticos de tamanho crescente (gerados a partir de examples/).
+Reporta ops/s e p50/p95/p99, salva os resultados em JSON e, com --baseline,
+falha (código de saída 1) quando alguma etapa fica mais lenta que o limite.
+
+Uso:
+    python tests/benchmark.py --output tests/benchmark_baseline.json
+    python tests/benchmark.py --baseline tests/benchmark_baseline.json --threshold 0.25
+    python tests/benchmark.py --quick --no-model
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import SIZES, build_corpus, make_email_pdf  # noqa: E402
+
+# Sem rede: modelos apenas do cache local e respostas por template
+os.environ.setdefault('HF_HUB_OFFLINE', '1')
+os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+os.environ['OPENAI_API_KEY'] = ''
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, p):
+    """Percentil pelo método do posto mais próximo"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def measure(fn, inputs, min_time, min_iterations, max_iterations, warmup=3):
+    """
+    Executa fn sobre as entradas (em ciclo) até atingir min_time segundos e
+    min_iterations chamadas. Retorna ops/s e percentis em milissegundos.
+    """
+    for i in range(min(warmup, len(inputs))):
+        fn(inputs[i])
+
+    durations = []
+    started = time.perf_counter()
+    i = 0
+    while i < max_iterations and (i < min_iterations or time.perf_counter() - started < min_time):
+        value = inputs[i % len(inputs)]
+        t0 = time.perf_counter()
+        fn(value)
+        durations.append(time.perf_counter() - t0)
+        i += 1
+
+    durations.sort()
+    total = sum(durations)
+    result = {
+        'iterations': len(durations),
+        'ops_per_second': round(len(durations) / total, 2) if total else 0.0,
+        'mean_ms': round(total / len(durations) * 1000, 4)
+    }
+    for p in PERCENTILES:
+        result[f'p{p}_ms'] = round(percentile(durations, p) * 1000, 4)
+    return result
+
+
+@contextmanager
+def cascade_mode(app, mode):
+    """
+    Ajusta a cascata durante a medição:
+    - model: as palavras-chave nunca decidem, todo email passa pelo transformer
+    - fallback: transformer desligado, como enquanto o modelo carrega ou após uma falha
+    """
+    tiers = {tier['name']: tier for tier in app.cascade.tiers}
+    saved = {name: dict(tier) for name, tier in tiers.items()}
+    if mode == 'model' and 'keywords' in tiers:
+        tiers['keywords']['threshold'] = float('inf')
+    elif mode == 'fallback':
+        for name in ('embeddings', 'transformer'):
+            if name in tiers:
+                tiers[name]['enabled'] = lambda: False
+    try:
+        yield
+    finally:
+        for name, tier in tiers.items():
+            tier.update(saved[name])
+
+
+def build_cases(app, args, pdf_dir):
+    """Gera (nome, função, entradas, modo da cascata); os corpora são criados sob demanda"""
+    count = 50 if args.quick else 200
+    linear = app.current_linear_model()
+    embeddings = app.model_manager.get('embeddings')
+
+    for size, repeat in SIZES.items():
+        corpus = build_corpus(count, repeat)
+        yield f'preprocess_text[{size}]', app.preprocess_text, corpus, None
+        yield f'preprocess_texts[{size},lote]', app.preprocess_texts, [corpus], None
+        yield f'classify_with_keywords[{size}]', app.classify_with_keywords, corpus, None
+        if linear is not None:
+            yield f'linear_model[{size}]', linear.classify, corpus, None
+
+        # Cada chamada usa um texto novo: nenhuma medição acerta o cache de resultados
+        unique = [f"{text}\n{size}-{i}" for i, text in enumerate(build_corpus(args.max_iterations + 10, repeat))]
+        if embeddings is not None:
+            # Textos novos passam pelo encoder; os repetidos medem o cache de embeddings + matmul
+            yield f'embeddings[{size}]', embeddings.classify, [f"{text}\nsemantico" for text in unique], None
+            yield f'embeddings_cached[{size}]', embeddings.classify, corpus[:3], None
+        yield f'classify_email[fallback,{size}]', app.classify_email, unique, 'fallback'
+        if not args.no_model:
+            # Textos diferentes dos anteriores: decisões das palavras-chave ficam no cache
+            yield f'classify_email[model,{size}]', app.classify_email, [f"{text}\nmodelo" for text in unique], 'model'
+            token_stage = app.current_token_stage()
+            if token_stage is not None:
+                # Textos novos: mede o tokenizador rápido, sem acertos no cache de tokens
+                yield f'tokenize[{size}]', token_stage.encode, [[f"{text}\ntokens"] for text in unique], None
+        del unique
+
+        pages = max(1, repeat // 4)
+        pdf_paths = []
+        for i, text in enumerate(corpus[:10]):
+            path = os.path.join(pdf_dir, f'{size}_{i}.pdf')
+            with open(path, 'wb') as f:
+                f.write(make_email_pdf(text, pages))
+            pdf_paths.append(path)
+        yield f'extract_text_from_pdf[{size},{pages}p]', app.extract_text_from_pdf, pdf_paths, None
+
+    yield 'generate_response_template', app.generate_response_template, ['Produtivo', 'Improdutivo'], None
+
+
+def run_benchmarks(args):
+    if args.no_model:
+        # Sem o estágio do transformer o classificador não é carregado e não disputa CPU com as medições
+        tiers = os.getenv('CASCADE_TIERS', 'linear,keywords,transformer').split(',')
+        os.environ['CASCADE_TIERS'] = ','.join(tier for tier in tiers if tier.strip() != 'transformer')
+    os.environ['MODEL_LOADING'] = 'eager'
+
+    print("⏳ Importando aplicação...")
+    import main as app
+
+    app.model_manager.wait('nltk')
+    app.model_manager.wait('linear')
+    app.model_manager.wait('embeddings')
+    model_ready = not args.no_model and app.model_manager.is_ready('classifier')
+    if not args.no_model and not model_ready:
+        print("⚠️  Modelo indisponível (sem cache local?): classify_email[model] será ignorado")
+        args.no_model = True
+
+    results = {}
+    with tempfile.TemporaryDirectory() as pdf_dir:
+        for name, fn, inputs, mode in build_cases(app, args, pdf_dir):
+            if args.filter and args.filter not in name:
+                continue
+            with cascade_mode(app, mode):
+                result = measure(fn, inputs, args.min_time, args.min_iterations, args.max_iterations)
+            results[name] = result
+            print(f"  {name:<42} {result['ops_per_second']:>10.1f} ops/s   "
+                  f"p50 {result['p50_ms']:>9.4f}ms   p95 {result['p95_ms']:>9.4f}ms   p99 {result['p99_ms']:>9.4f}ms")
+
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'inference_backend': getattr(app.model_manager.get('classifier'), 'name', None),
+        'results': results
+    }
+
+
+def compare(report, baseline, threshold, min_delta_ms=0.05):
+    """
+    Etapas cujo p50 ficou mais de threshold (fração) acima do baseline.
+    Diferenças absolutas menores que min_delta_ms são ruído de medição e não contam.
+    """
+    regressions = []
+    for name, result in report['results'].items():
+        reference = baseline.get('results', {}).get(name)
+        if not reference or not reference['p50_ms']:
+            continue
+        change = result['p50_ms'] / reference['p50_ms'] - 1
+        if change > threshold and result['p50_ms'] - reference['p50_ms'] >= min_delta_ms:
+            regressions.append((name, reference['p50_ms'], result['p50_ms'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks das etapas do classificador")
+    parser.add_argument('--output', help='Salva os resultados em JSON (ex.: para usar como baseline)')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparação')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Aumento máximo aceito no p50 (padrão: 0.25 = 25%%)')
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help='Diferença mínima no p50 para contar como regressão (ms)')
+    parser.add_argument('--min-time', type=float, default=1.0, help='Tempo mínimo de medição por etapa (s)')
+    parser.add_argument('--min-iterations', type=int, default=20)
+    parser.add_argument('--max-iterations', type=int, default=2000)
+    parser.add_argument('--filter', help='Executa apenas as etapas cujo nome contém este texto')
+    parser.add_argument('--no-model', action='store_true', help='Não carrega o modelo transformer')
+    parser.add_argument('--quick', action='store_true', help='Medições curtas, para verificar o script')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.min_time = 0.2
+        args.min_iterations = 5
+        args.max_iterations = min(args.max_iterations, 200)
+
+    print("=" * 60)
+    print("BENCHMARK DO PIPELINE")
+    print("=" * 60)
+    report = run_benchmarks(args)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultados salvos em {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        print(f"\n📊 Comparação com {args.baseline} (limite: +{args.threshold:.0%} no p50)")
+        if regressions:
+            for name, before, after, change in regressions:
+                print(f"  ❌ {name}: {before:.3f}ms -> {after:.3f}ms (+{change:.0%})")
+            sys.exit(1)
+        print("  ✅ Nenhuma regressão")
+
+
+if __name__ == '__main__':
+    main()
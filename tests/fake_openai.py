@@ -0,0 +1,155 @@
+"""
+Servidor local compatível com a API de chat completions da OpenAI, para testes
+de carga sem chave e sem rede.
+
+Responde a POST /v1/chat/completions após uma latência configurável e devolve
+erros (500, 429, 503...) em uma fração configurável das chamadas. Pedidos com
+response_format JSON recebem um objeto no formato esperado pela triagem; na
+triagem em lote (vários <email id="...">), uma lista 'resultados' com um item
+por id, omitindo uma fração configurável dos itens (--drop-rate).
+GET /stats retorna os contadores do servidor.
+
+Uso:
+    python tests/fake_openai.py --port 8765 --latency-ms 800 --jitter-ms 400 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python main.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_EMAIL_ID = re.compile(r'<email id="([^"]+)">')
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Mantém as conexões do pool do cliente abertas
+
+    # Configuração e contadores compartilhados (definidos por make_server)
+    latency = 0.8
+    jitter = 0.4
+    error_rate = 0.0
+    error_statuses = (500,)
+    drop_rate = 0.0
+    stats = Counter()
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            with self.stats_lock:
+                return self._send_json(200, dict(self.stats))
+        self._send_json(404, {'error': {'message': 'Not found'}})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self._send_json(404, {'error': {'message': 'Not found'}})
+
+        self._count('requests')
+        time.sleep(max(0.0, random.uniform(self.latency - self.jitter, self.latency + self.jitter)))
+
+        if random.random() < self.error_rate:
+            status = random.choice(self.error_statuses)
+            self._count(f'error_{status}')
+            return self._send_json(status, {'error': {'message': 'Erro simulado', 'type': 'server_error'}})
+
+        if (body.get('response_format') or {}).get('type') == 'json_object':
+            content = self._triage_content(body)
+        else:
+            content = ('Prezado(a),\n\nRecebemos sua mensagem e retornaremos em breve.\n\n'
+                       'Atenciosamente,\nEquipe de Atendimento')
+
+        self._count('ok')
+        self._send_json(200, {
+            'id': f"chatcmpl-fake-{self.stats['requests']}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'finish_reason': 'stop',
+                'message': {'role': 'assistant', 'content': content}
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        })
+
+    def _triage_content(self, body):
+        """Objeto da triagem de um email ou lista 'resultados' da triagem em lote"""
+        prompt = ''.join(message.get('content', '') for message in body.get('messages', []))
+        ids = _EMAIL_ID.findall(prompt)
+        if not ids:
+            return json.dumps({'categoria': 'PRODUTIVO', 'resposta_sugerida': 'Resposta simulada.'})
+
+        self._count('batched_calls')
+        results = []
+        for email_id in ids:
+            if random.random() < self.drop_rate:
+                self._count('dropped_items')
+                continue
+            results.append({'id': email_id, 'categoria': 'PRODUTIVO', 'resposta_sugerida': f'Resposta simulada {email_id}.'})
+        return json.dumps({'resultados': results})
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    request_queue_size = 1024  # Picos de conexões simultâneas do teste de carga
+    daemon_threads = True
+
+
+def make_server(host='127.0.0.1', port=8765, latency_ms=800, jitter_ms=400, error_rate=0.0, error_statuses=(500,),
+                drop_rate=0.0):
+    """Cria o servidor (ainda parado) com a latência e a taxa de erros indicadas"""
+    handler = type('ConfiguredFakeOpenAIHandler', (FakeOpenAIHandler,), {
+        'latency': latency_ms / 1000,
+        'jitter': min(jitter_ms, latency_ms) / 1000,
+        'error_rate': error_rate,
+        'error_statuses': tuple(error_statuses),
+        'drop_rate': drop_rate,
+        'stats': Counter(),
+        'stats_lock': threading.Lock()
+    })
+    return FakeOpenAIServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor OpenAI simulado para testes de carga")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=800, help='Latência média de cada resposta')
+    parser.add_argument('--jitter-ms', type=float, default=400, help='Variação da latência (uniforme, ±)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração das chamadas que retornam erro')
+    parser.add_argument('--error-statuses', default='500', help='Códigos de erro sorteados (ex.: 500,429,503)')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='Fração dos itens omitidos na triagem em lote')
+    args = parser.parse_args()
+
+    server = make_server(
+        args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+        [int(status) for status in args.error_statuses.split(',')], args.drop_rate
+    )
+    print(f"🤖 OpenAI simulada em http://{args.host}:{args.port}/v1 "
+          f"(latência {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms, erros {args.error_rate:.0%})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
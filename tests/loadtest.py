@@ -0,0 +1,324 @@
+"""
+Teste de carga ponta a ponta do /api/classify, sem chave da OpenAI e sem rede.
+
+Sobe a aplicação no gunicorn, ao lado de um servidor OpenAI simulado
+(fake_openai.py) com latência e taxa de erros configuráveis, e gera tráfego em
+malha aberta: as requisições chegam em instantes sorteados (processo de
+Poisson) independentemente das respostas, como usuários reais. A latência é
+medida a partir do instante planejado de chegada, de modo que a fila formada
+quando o servidor não acompanha a carga entra na medição.
+
+Cenários: número de clientes (10, 100, 1000) x respostas com/sem LLM x
+texto/PDF. Para cada um, reporta vazão, latência (p50/p95/p99/máx.) e erros
+por tipo e, no Linux, a memória de cada worker do gunicorn (RSS, PSS e
+privada), para comparar o compartilhamento dos modelos com e sem preload.
+
+Uso:
+    python tests/loadtest.py
+    python tests/loadtest.py --clients 10,100 --llm on --payload pdf --duration 30
+    python tests/loadtest.py --url http://localhost:5000 --clients 10   # servidor já rodando
+    python tests/loadtest.py --llm off --payload text --workers 4 --preload off
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import load_examples, make_email_pdf  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def wait_for(url, timeout, expected=(200,)):
+    """Aguarda até a URL responder com um dos status esperados"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=2).status_code in expected:
+                return True
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+# Processos --------------------------------------------------------------------
+
+def start_fake_openai(args, log):
+    port = free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, os.path.join(ROOT, 'tests', 'fake_openai.py'),
+            '--port', str(port),
+            '--latency-ms', str(args.latency_ms),
+            '--jitter-ms', str(args.jitter_ms),
+            '--error-rate', str(args.error_rate),
+            '--error-statuses', args.error_statuses
+        ],
+        stdout=log, stderr=subprocess.STDOUT
+    )
+    if not wait_for(f'http://127.0.0.1:{port}/stats', 15):
+        process.terminate()
+        raise RuntimeError("O servidor OpenAI simulado não iniciou")
+    return process, f'http://127.0.0.1:{port}'
+
+
+def start_app(args, llm, openai_url, log):
+    """Sobe main:app no gunicorn; com llm=False, a chave fica vazia e as respostas usam templates"""
+    port = free_port()
+    env = dict(os.environ)
+    env.setdefault('HF_HUB_OFFLINE', '1')
+    env.update({
+        'OPENAI_API_KEY': 'fake-key' if llm else '',
+        'OPENAI_BASE_URL': f'{openai_url}/v1',
+        'PYTHONUNBUFFERED': '1',
+        'GUNICORN_PRELOAD': '1' if args.preload == 'on' else '0'
+    })
+    process = subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn', 'main:app',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(args.workers),
+            '--threads', str(args.threads),
+            '--timeout', '120',
+            '--backlog', '2048'
+        ],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    if not wait_for(f'{base_url}/api/health', 120):
+        process.terminate()
+        raise RuntimeError(f"A aplicação não iniciou (veja o log em {log.name})")
+
+    # Até os modelos carregarem, a cascata usa o fallback: a medição seria de outro caminho
+    if not wait_for(f'{base_url}/api/ready', args.ready_timeout):
+        print(f"⚠️  Modelos não ficaram prontos em {args.ready_timeout:.0f}s: medindo com o fallback de palavras-chave")
+    return process, base_url
+
+
+def worker_memory(master_pid):
+    """
+    Memória de cada worker em MB (Linux): RSS conta as páginas compartilhadas em
+    todos os processos; PSS divide cada página compartilhada entre eles; a
+    privada é o que cada worker não compartilha (ex.: páginas copiadas após o fork)
+    """
+    try:
+        with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+            pids = [int(pid) for pid in f.read().split()]
+    except OSError:
+        return None
+
+    workers = []
+    for pid in pids:
+        fields = {}
+        try:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                for line in f:
+                    name, _, value = line.partition(':')
+                    if value.strip().endswith('kB'):
+                        fields[name] = int(value.split()[0])
+        except OSError:
+            continue
+        workers.append({
+            'pid': pid,
+            'rss_mb': round(fields.get('Rss', 0) / 1024, 1),
+            'pss_mb': round(fields.get('Pss', 0) / 1024, 1),
+            'private_mb': round((fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)) / 1024, 1)
+        })
+    return workers
+
+
+def print_memory(workers):
+    if not workers:
+        return
+    total_pss = sum(worker['pss_mb'] for worker in workers)
+    print(f"        memória: {len(workers)} workers, PSS total {total_pss:.0f}MB | " + ', '.join(
+        f"RSS {worker['rss_mb']:.0f}MB / privada {worker['private_mb']:.0f}MB" for worker in workers
+    ))
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# Geração de carga -------------------------------------------------------------
+
+def make_payload(kind, index, examples, pdf_pages):
+    """Corpo da requisição; cada email é único para não acertar o cache de resultados"""
+    text = f"Protocolo {index:08d}-{random.getrandbits(32):08x}\n\n{examples[index % len(examples)]}"
+    if kind == 'pdf':
+        return {'files': {'file': (f'email_{index}.pdf', make_email_pdf(text, pdf_pages), 'application/pdf')}}
+    return {'json': {'text': text}}
+
+
+async def send(client, kind, index, scheduled, examples, pdf_pages, loop):
+    """Envia uma requisição e retorna (latência desde a chegada planejada, erro ou None)"""
+    try:
+        response = await client.post('/api/classify', **make_payload(kind, index, examples, pdf_pages))
+        error = None if response.status_code == 200 else f'http_{response.status_code}'
+    except httpx.TimeoutException:
+        error = 'timeout'
+    except httpx.ConnectError:
+        error = 'connection'
+    except httpx.HTTPError as e:
+        error = type(e).__name__
+    return loop.time() - scheduled, error
+
+
+async def run_scenario(base_url, clients, kind, args, examples):
+    """
+    Malha aberta: chegadas de Poisson com taxa clients * rate_per_client durante
+    args.duration segundos. Cada cliente corresponde a uma conexão do pool.
+    """
+    loop = asyncio.get_running_loop()
+    rate = clients * args.rate_per_client
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    timeout = httpx.Timeout(args.timeout, pool=None)  # A espera por conexão faz parte da latência
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        started = loop.time()
+        tasks = []
+        offset = random.expovariate(rate)
+        while offset < args.duration:
+            delay = started + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(
+                send(client, kind, len(tasks), started + offset, examples, args.pdf_pages, loop)
+            ))
+            offset += random.expovariate(rate)
+        sent_at = loop.time() - started
+        results = await asyncio.gather(*tasks)
+        elapsed = loop.time() - started
+
+    latencies = sorted(latency for latency, error in results if error is None)
+    errors = Counter(error for _, error in results if error is not None)
+    return {
+        'clients': clients,
+        'payload': kind,
+        'offered_rps': round(rate, 2),
+        'requests': len(results),
+        'succeeded': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'send_lag_s': round(sent_at - args.duration, 3),  # > 0: o gerador não acompanhou a taxa
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50) * 1000, 1),
+            'p95': round(percentile(latencies, 95) * 1000, 1),
+            'p99': round(percentile(latencies, 99) * 1000, 1),
+            'max': round(latencies[-1] * 1000, 1) if latencies else 0.0
+        },
+        'errors': dict(errors),
+        'error_rate': round(sum(errors.values()) / len(results), 4) if results else 0.0
+    }
+
+
+def print_row(mode, result):
+    latency = result['latency_ms']
+    errors = ', '.join(f'{name}={count}' for name, count in sorted(result['errors'].items())) or '-'
+    print(f"  {mode:<5} {result['payload']:<5} {result['clients']:>5} clientes | "
+          f"{result['offered_rps']:>7.1f} req/s oferecidas, {result['throughput_rps']:>7.1f} req/s atendidas | "
+          f"p50 {latency['p50']:>8.1f}ms  p95 {latency['p95']:>8.1f}ms  p99 {latency['p99']:>8.1f}ms | erros: {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do /api/classify com OpenAI simulada")
+    parser.add_argument('--clients', default='10,100,1000', help='Níveis de clientes simultâneos')
+    parser.add_argument('--llm', default='off,on', help='Respostas com LLM: off, on ou off,on')
+    parser.add_argument('--payload', default='text,pdf', help='Tipo de envio: text, pdf ou text,pdf')
+    parser.add_argument('--duration', type=float, default=20.0, help='Duração de cada cenário (s)')
+    parser.add_argument('--rate-per-client', type=float, default=1.0, help='Requisições por segundo de cada cliente')
+    parser.add_argument('--timeout', type=float, default=60.0, help='Timeout de cada requisição (s)')
+    parser.add_argument('--pdf-pages', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=2, help='Workers do gunicorn')
+    parser.add_argument('--threads', type=int, default=8, help='Threads por worker do gunicorn')
+    parser.add_argument('--preload', choices=['on', 'off'], default='on',
+                        help='Modelos carregados no mestre e compartilhados pelos workers (gunicorn.conf.py)')
+    parser.add_argument('--ready-timeout', type=float, default=180.0, help='Espera máxima pela carga dos modelos (s)')
+    parser.add_argument('--latency-ms', type=float, default=800, help='Latência média da OpenAI simulada')
+    parser.add_argument('--jitter-ms', type=float, default=400)
+    parser.add_argument('--error-rate', type=float, default=0.02, help='Fração de erros da OpenAI simulada')
+    parser.add_argument('--error-statuses', default='500,429,503')
+    parser.add_argument('--url', help='Usa um servidor já em execução em vez de subir o gunicorn')
+    parser.add_argument('--output', help='Salva os resultados em JSON')
+    args = parser.parse_args()
+
+    client_levels = [int(value) for value in args.clients.split(',')]
+    llm_modes = args.llm.split(',') if not args.url else ['ext']
+    payloads = args.payload.split(',')
+    examples = load_examples()
+
+    print("=" * 60)
+    print("TESTE DE CARGA - /api/classify")
+    print("=" * 60)
+
+    results = []
+    log = tempfile.NamedTemporaryFile('w', prefix='loadtest-', suffix='.log', delete=False)
+    fake_openai = None
+    try:
+        if not args.url:
+            fake_openai, openai_url = start_fake_openai(args, log)
+            print(f"🤖 OpenAI simulada: {openai_url} (latência {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms, "
+                  f"erros {args.error_rate:.0%})")
+
+        for mode in llm_modes:
+            app = None
+            if args.url:
+                base_url = args.url
+            else:
+                print(f"\n🚀 Subindo a aplicação (LLM {mode}, {args.workers} workers x {args.threads} threads, "
+                      f"preload {args.preload})...")
+                app, base_url = start_app(args, mode == 'on', openai_url, log)
+            try:
+                for kind in payloads:
+                    for clients in client_levels:
+                        result = asyncio.run(run_scenario(base_url, clients, kind, args, examples))
+                        result['llm'] = mode
+                        if app is not None:
+                            result['memory'] = worker_memory(app.pid)
+                        results.append(result)
+                        print_row(mode, result)
+                        print_memory(result.get('memory'))
+            finally:
+                if app is not None:
+                    stop(app)
+    finally:
+        if fake_openai is not None:
+            stop(fake_openai)
+        log.close()
+
+    print(f"\n📄 Log dos servidores: {log.name}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'config': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"💾 Resultados salvos em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Dados sintéticos para benchmarks e testes de carga, gerados a partir de examples/.
+Não depende de rede nem de bibliotecas extras (o PDF é montado à mão).
+"""
+import glob
+import os
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'examples')
+
+# Tamanhos dos corpora: quantas vezes o corpo do email de exemplo é repetido
+SIZES = {'pequeno': 1, 'medio': 8, 'grande': 64}
+
+
+def load_examples():
+    """Textos dos emails de exemplo (examples/*.txt)"""
+    texts = []
+    for path in sorted(glob.glob(os.path.join(EXAMPLES_DIR, '*.txt'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.append(f.read().strip())
+    if not texts:
+        raise FileNotFoundError(f"Nenhum exemplo .txt encontrado em {EXAMPLES_DIR}")
+    return texts
+
+
+def build_corpus(count, repeat=1, examples=None):
+    """
+    Gera count emails distintos (cada um com um identificador próprio, para não
+    acertar o cache), alternando os exemplos e repetindo o corpo repeat vezes.
+    """
+    examples = examples or load_examples()
+    corpus = []
+    for i in range(count):
+        body = examples[i % len(examples)]
+        paragraphs = [body] + [body.split('\n\n', 1)[-1]] * (repeat - 1)
+        corpus.append(f"Protocolo {i:06d}\n\n" + '\n\n'.join(paragraphs))
+    return corpus
+
+
+def make_pdf(pages):
+    """PDF mínimo (Helvetica, uma linha por linha de texto) com uma página por item de pages"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = ' '.join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    font_id = 3 + 2 * len(pages)
+
+    for i, text in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>".encode()
+        )
+        lines = []
+        for j, line in enumerate(text.split('\n')[:50]):
+            escaped = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            lines.append(f"BT /F1 12 Tf 50 {750 - 14 * j} Td ({escaped}) Tj ET")
+        stream = '\n'.join(lines).encode('latin-1', errors='replace')
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return output
+
+
+def make_email_pdf(text, pages=1):
+    """PDF com o email na primeira página e páginas extras repetindo o corpo"""
+    return make_pdf([text] * pages)
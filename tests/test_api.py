@@ -5,6 +5,7 @@ Execute: python test_api.py
 
 import requests
 import json
+import time
 
 BASE_URL = "http://localhost:5000"
 
@@ -92,6 +93,109 @@ def test_classify_file():
         print(f"❌ Erro: {e}")
         return False
 
+def test_classify_batch():
+    """Testa classificação em lote com textos"""
+    print("\n🔍 Testando classificação em lote...")
+    
+    emails = [
+        "Preciso de suporte: o sistema apresenta erro ao gerar o relatório.",
+        "Feliz natal e um próspero ano novo a toda a equipe!",
+        ""
+    ]
+    
+    try:
+        response = requests.post(
+            f"{BASE_URL}/api/classify/batch",
+            json={"texts": emails},
+            headers={"Content-Type": "application/json"}
+        )
+        
+        if response.status_code == 200:
+            data = response.json()
+            print("✅ Classificação em lote OK")
+            print(f"   Total: {data['total']} | Sucesso: {data['succeeded']} | Falhas: {data['failed']}")
+            for item in data['results']:
+                if item['success']:
+                    print(f"   [{item['index']}] {item['category']} ({item['confidence']}%)")
+                else:
+                    print(f"   [{item['index']}] Erro: {item['error']}")
+            # O item vazio deve falhar sem derrubar o lote
+            return data['succeeded'] == 2 and data['failed'] == 1
+        else:
+            print(f"❌ Classificação em lote falhou: {response.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return False
+
+def test_feedback():
+    """Testa o envio de uma correção de classificação"""
+    print("\n🔍 Testando correção de classificação...")
+    
+    email = "Bom dia, segue em anexo o comprovante solicitado para análise do contrato."
+    
+    try:
+        classified = requests.post(f"{BASE_URL}/api/classify", json={"text": email}).json()
+        
+        # dry_run: apenas valida, sem gravar no log nem treinar o modelo do servidor
+        response = requests.post(
+            f"{BASE_URL}/api/feedback",
+            json={
+                "text": email,
+                "category": classified['category'],
+                "predicted": classified['category'],
+                "tier": classified.get('tier'),
+                "dry_run": True
+            }
+        )
+        invalid = requests.post(f"{BASE_URL}/api/feedback", json={"text": email, "category": "Outra", "dry_run": True})
+        
+        if response.status_code == 200 and invalid.status_code == 400:
+            data = response.json()
+            print("✅ Correção OK (dry run)")
+            return data['dry_run'] and not data['model_updated']
+        else:
+            print(f"❌ Correção falhou: {response.status_code} / categoria inválida: {invalid.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return False
+
+def test_jobs():
+    """Testa a fila de jobs assíncronos: criação imediata e consulta até o resultado"""
+    print("\n🔍 Testando jobs assíncronos...")
+    
+    email = "Prezados, solicito a segunda via do boleto do contrato 778899 com urgência."
+    
+    try:
+        response = requests.post(f"{BASE_URL}/api/jobs", json={"text": email, "priority": 1})
+        if response.status_code != 202:
+            print(f"❌ Criação do job falhou: {response.status_code}")
+            return False
+        job_id = response.json()['job_id']
+        print(f"   Job criado: {job_id}")
+        
+        # Consulta o estado até o job terminar (ou 60s)
+        deadline = time.time() + 60
+        job = None
+        while time.time() < deadline:
+            job = requests.get(f"{BASE_URL}/api/jobs/{job_id}").json()
+            if job['status'] in ('done', 'failed'):
+                break
+            time.sleep(0.5)
+        
+        missing = requests.get(f"{BASE_URL}/api/jobs/inexistente")
+        if job and job['status'] == 'done' and job['result']['success'] and missing.status_code == 404:
+            print("✅ Job concluído")
+            print(f"   Categoria: {job['result']['category']} (tentativas: {job['attempts']})")
+            return True
+        else:
+            print(f"❌ Job não concluído: {job and job['status']} / job inexistente: {missing.status_code}")
+            return False
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return False
+
 def main():
     print("=" * 50)
     print("🧪 TESTE DA API - Classificador de Emails")
@@ -106,6 +210,9 @@ def main():
     if results[0][1]:  # Só testa se health check passou
         results.append(("Classificação (Texto)", test_classify_text()))
         results.append(("Classificação (Arquivo)", test_classify_file()))
+        results.append(("Classificação (Lote)", test_classify_batch()))
+        results.append(("Correção (Feedback)", test_feedback()))
+        results.append(("Jobs Assíncronos", test_jobs()))
     
     # Resumo
     print("\n" + "=" * 50)
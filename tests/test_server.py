@@ -12,7 +12,7 @@ print("=" * 60)
 try:
     # Importar o app
     print("\n[1/3] Importando aplicação...")
-    from main import app
+    from main import app, start_job_workers
     print("✅ Aplicação importada com sucesso!")
     
     # Verificar se o app foi criado
@@ -29,6 +29,7 @@ try:
     print("=" * 60)
     
     port = int(os.environ.get('PORT', 5000))
+    start_job_workers()
     app.run(debug=True, host='127.0.0.1', port=port, use_reloader=False)
     
 except KeyboardInterrupt:
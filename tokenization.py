@@ -0,0 +1,102 @@
+"""
+Estágio único de tokenização com o tokenizador rápido (Rust) do modelo.
+
+Cada email é tokenizado uma única vez: os ids e os offsets (posição de cada
+token no texto) ficam em um cache LRU pelo hash do conteúdo, e todos os
+consumidores reutilizam o mesmo resultado:
+- o estágio transformer recebe os ids já truncados no orçamento de tokens do
+  modelo (em vez de text[:512], que cortava em caracteres);
+- o prompt da OpenAI recebe o trecho do email que cabe em um orçamento de
+  tokens, cortado na fronteira de um token (via offsets).
+
+Os textos ausentes do cache são codificados em lote, em uma única chamada ao
+tokenizador.
+"""
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+MAX_CHARS = 20000
+
+Encoding = namedtuple('Encoding', ['ids', 'offsets'])
+
+
+def _key(text):
+    # Hash do texto exato: os offsets dependem de maiúsculas e espaços
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+class TokenizationStage:
+    """Tokenização em lote com cache de ids e offsets por conteúdo"""
+
+    def __init__(self, tokenizer, max_length=512, cache_size=10000):
+        self.tokenizer = tokenizer
+        # Orçamento de tokens do modelo, descontando [CLS]/[SEP] (ou equivalentes)
+        self.max_tokens = min(max_length, tokenizer.model_max_length) - tokenizer.num_special_tokens_to_add()
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.tokens_encoded = 0
+
+    def encode(self, texts):
+        """Encoding(ids, offsets) de cada texto; apenas os ausentes do cache passam pelo tokenizador"""
+        keys = [_key(text) for text in texts]
+        encodings = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                encoding = self._cache.get(key)
+                if encoding is not None:
+                    self._cache.move_to_end(key)
+                    encodings[i] = encoding
+            missing = [i for i, encoding in enumerate(encodings) if encoding is None]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            encoded = self.tokenizer(
+                [texts[i][:MAX_CHARS] for i in missing],
+                add_special_tokens=False,
+                truncation=False,
+                return_offsets_mapping=True,
+                return_attention_mask=False,
+                return_token_type_ids=False,
+                verbose=False
+            )
+            with self._lock:
+                for i, ids, offsets in zip(missing, encoded['input_ids'], encoded['offset_mapping']):
+                    encoding = Encoding(
+                        np.asarray(ids, dtype=np.int32),
+                        np.asarray(offsets, dtype=np.int32).reshape(-1, 2)
+                    )
+                    encodings[i] = encoding
+                    self.tokens_encoded += len(ids)
+                    self._cache[keys[i]] = encoding
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return encodings
+
+    def truncate(self, encoding, max_tokens=None):
+        """Ids dentro do orçamento de tokens (padrão: o máximo do modelo)"""
+        return encoding.ids[:max_tokens or self.max_tokens]
+
+    def prefix(self, text, encoding, max_tokens):
+        """Trecho do texto com no máximo max_tokens tokens, terminando na fronteira de um token"""
+        if len(encoding.ids) <= max_tokens:
+            return text[:MAX_CHARS]
+        return text[:int(encoding.offsets[max_tokens - 1][1])]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'entries': len(self._cache),
+                'tokens_encoded': self.tokens_encoded,
+                'max_tokens': self.max_tokens
+            }
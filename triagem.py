@@ -1,7 +1,81 @@
+import asyncio
 import os
 import json
 import openai
 
+from llm import LLMTimeoutError, get_llm_service
+
+# Mensagem do sistema para orientar a IA
+SYSTEM_MESSAGE = (
+    "Você é um assistente de triagem financeira especializado em classificar e-mails de clientes. "
+    "Seja criterioso: classifique como PRODUTIVO apenas e-mails que exigem ação concreta, como suporte, dúvidas operacionais, envio de documentos ou status de requisições. "
+    "Não classifique pedidos legítimos de clientes como IMPRODUTIVO, mesmo que sejam educados. "
+    "IMPRODUTIVO são apenas felicitações, agradecimentos irrelevantes ou mensagens não relacionadas ao negócio. "
+    "Para cada e-mail, gere uma resposta curta, profissional e em português brasileiro. "
+    "Retorne APENAS um objeto JSON válido com as chaves 'categoria' (PRODUTIVO ou IMPRODUTIVO) e 'resposta_sugerida' (string)."
+)
+
+# Parâmetros da chamada
+TRIAGEM_PARAMS = {
+    "max_tokens": 300,  # Limite para resposta concisa
+    "temperature": 0.3,  # Baixa variabilidade para consistência
+    "response_format": {"type": "json_object"}  # Força saída JSON
+}
+
+# Triagem em lote: vários e-mails por chamada, com a mensagem do sistema enviada uma única vez
+SYSTEM_MESSAGE_LOTE = SYSTEM_MESSAGE.replace(
+    "Retorne APENAS um objeto JSON válido com as chaves 'categoria' (PRODUTIVO ou IMPRODUTIVO) e 'resposta_sugerida' (string).",
+    "Você receberá vários e-mails, cada um identificado por um id. "
+    "Retorne APENAS um objeto JSON válido com a chave 'resultados': uma lista com um item para cada e-mail, "
+    "contendo 'id' (o id do e-mail), 'categoria' (PRODUTIVO ou IMPRODUTIVO) e 'resposta_sugerida' (string)."
+)
+CATEGORIAS = ("PRODUTIVO", "IMPRODUTIVO")
+
+LOTE_ORCAMENTO_TOKENS = int(os.getenv('TRIAGEM_LOTE_TOKENS', 3000))  # Tokens de entrada por chamada
+LOTE_MAX_EMAILS = int(os.getenv('TRIAGEM_LOTE_MAX_EMAILS', 20))
+LOTE_TOKENS_POR_RESPOSTA = 150  # Saída reservada para cada e-mail do lote
+LOTE_MAX_TOKENS_SAIDA = 4000
+LOTE_RETENTATIVAS = 2  # Rodadas extras apenas para os itens que falharam
+
+
+def _montar_mensagens(texto_email):
+    """Monta as mensagens do sistema e do usuário para um e-mail"""
+    # Prompt do usuário com o texto do e-mail
+    user_message = f"Analise o seguinte e-mail e forneça a classificação e resposta sugerida:\n\n{texto_email}"
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE},
+        {"role": "user", "content": user_message}
+    ]
+
+
+def _interpretar_resposta(resposta_json):
+    """Parseia e valida a resposta JSON da IA"""
+    resultado = json.loads(resposta_json)
+
+    # Validar se as chaves esperadas estão presentes
+    if "categoria" not in resultado or "resposta_sugerida" not in resultado:
+        raise ValueError("Resposta da IA não contém as chaves obrigatórias.")
+
+    return resultado
+
+
+def _erro(e):
+    """Converte uma exceção no dicionário de erro retornado pela triagem"""
+    if isinstance(e, openai.APIError):
+        return {"erro": f"Erro na API OpenAI: {str(e)}"}
+    if isinstance(e, LLMTimeoutError):
+        return {"erro": f"Tempo esgotado na API OpenAI: {str(e)}"}
+    if isinstance(e, json.JSONDecodeError):
+        return {"erro": f"Erro ao parsear resposta JSON: {str(e)}"}
+    return {"erro": f"Erro inesperado: {str(e)}"}
+
+
+def _chave_nao_configurada():
+    return {
+        "erro": "Chave da API OpenAI não configurada. Defina OPENAI_API_KEY no ambiente."
+    }
+
+
 def processar_triagem_email(texto_email):
     """
     Função para triar e-mails usando IA (OpenAI).
@@ -14,60 +88,165 @@ def processar_triagem_email(texto_email):
         dict: Dicionário contendo 'categoria' e 'resposta_sugerida', ou erro em caso de falha.
     """
     # Obter chave da API do ambiente
-    api_key = os.getenv('OPENAI_API_KEY')
-    if not api_key:
-        return {
-            "erro": "Chave da API OpenAI não configurada. Defina OPENAI_API_KEY no ambiente."
-        }
-
-    # Configurar OpenAI
-    openai.api_key = api_key
-
-    # Mensagem do sistema para orientar a IA
-    system_message = (
-        "Você é um assistente de triagem financeira especializado em classificar e-mails de clientes. "
-        "Seja criterioso: classifique como PRODUTIVO apenas e-mails que exigem ação concreta, como suporte, dúvidas operacionais, envio de documentos ou status de requisições. "
-        "Não classifique pedidos legítimos de clientes como IMPRODUTIVO, mesmo que sejam educados. "
-        "IMPRODUTIVO são apenas felicitações, agradecimentos irrelevantes ou mensagens não relacionadas ao negócio. "
-        "Para cada e-mail, gere uma resposta curta, profissional e em português brasileiro. "
-        "Retorne APENAS um objeto JSON válido com as chaves 'categoria' (PRODUTIVO ou IMPRODUTIVO) e 'resposta_sugerida' (string)."
+    if not os.getenv('OPENAI_API_KEY'):
+        return _chave_nao_configurada()
+
+    try:
+        # Chamada pelo cliente assíncrono compartilhado (com prazo e retentativas)
+        resposta_json = get_llm_service().chat_sync(_montar_mensagens(texto_email), **TRIAGEM_PARAMS)
+        return _interpretar_resposta(resposta_json)
+    except Exception as e:
+        return _erro(e)
+
+
+async def processar_triagem_email_async(texto_email):
+    """
+    Versão assíncrona de processar_triagem_email, para uso dentro do event loop
+    do serviço de LLM (ex.: várias triagens com asyncio.gather).
+    """
+    if not os.getenv('OPENAI_API_KEY'):
+        return _chave_nao_configurada()
+
+    try:
+        resposta_json = await get_llm_service().chat(_montar_mensagens(texto_email), **TRIAGEM_PARAMS)
+        return _interpretar_resposta(resposta_json)
+    except Exception as e:
+        return _erro(e)
+
+
+# Triagem em lote -------------------------------------------------------------
+
+def estimar_tokens(texto):
+    """Estimativa conservadora de tokens (~3 caracteres por token em português), sem tokenizador"""
+    return len(texto) // 3 + 1
+
+
+def empacotar(textos, orcamento_tokens=LOTE_ORCAMENTO_TOKENS, max_emails=LOTE_MAX_EMAILS):
+    """
+    Agrupa os índices dos e-mails em pacotes que cabem no orçamento de tokens de
+    entrada, mantendo a ordem. Um e-mail maior que o orçamento vai sozinho.
+    """
+    disponivel = orcamento_tokens - estimar_tokens(SYSTEM_MESSAGE_LOTE)
+    pacotes, atual, usado = [], [], 0
+    for i, texto in enumerate(textos):
+        custo = estimar_tokens(texto) + 10  # Delimitadores e id
+        if atual and (usado + custo > disponivel or len(atual) >= max_emails):
+            pacotes.append(atual)
+            atual, usado = [], 0
+        atual.append(i)
+        usado += custo
+    if atual:
+        pacotes.append(atual)
+    return pacotes
+
+
+def _montar_mensagens_lote(itens):
+    """Mensagens de uma chamada com vários e-mails; itens = [(id, texto)]"""
+    blocos = "\n\n".join(f'<email id="{id_email}">\n{texto}\n</email>' for id_email, texto in itens)
+    user_message = (
+        f"Analise os {len(itens)} e-mails abaixo e forneça a classificação e a resposta sugerida de cada um:\n\n{blocos}"
     )
+    return [
+        {"role": "system", "content": SYSTEM_MESSAGE_LOTE},
+        {"role": "user", "content": user_message}
+    ]
+
+
+def _interpretar_resposta_lote(resposta_json, ids):
+    """
+    Valida cada item da resposta. Retorna {id: resultado} apenas com os itens
+    válidos; ids ausentes ou inválidos ficam de fora e são reenviados.
+    """
+    dados = json.loads(resposta_json)
+    itens = dados.get("resultados") if isinstance(dados, dict) else dados
+    if not isinstance(itens, list):
+        raise ValueError("Resposta da IA não contém a lista 'resultados'.")
+
+    validos = {}
+    for item in itens:
+        if not isinstance(item, dict):
+            continue
+        id_email = str(item.get("id", "")).strip()
+        categoria = str(item.get("categoria", "")).strip().upper()
+        resposta = item.get("resposta_sugerida")
+        if id_email in ids and categoria in CATEGORIAS and isinstance(resposta, str) and resposta.strip():
+            validos.setdefault(id_email, {"categoria": categoria, "resposta_sugerida": resposta.strip()})
+    return validos
 
-    # Prompt do usuário com o texto do e-mail
-    user_message = f"Analise o seguinte e-mail e forneça a classificação e resposta sugerida:\n\n{texto_email}"
 
+async def _triar_pacote(servico, textos, indices):
+    """Uma chamada para um pacote; retorna ({índice: resultado}, erro da chamada ou None)"""
+    ids = {str(posicao + 1): i for posicao, i in enumerate(indices)}
+    max_tokens = min(LOTE_MAX_TOKENS_SAIDA, LOTE_TOKENS_POR_RESPOSTA * len(indices) + 50)
     try:
-        # Chamada para a API OpenAI com formato JSON forçado
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",  # Ou gpt-4 se disponível
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ],
-            max_tokens=300,  # Limite para resposta concisa
-            temperature=0.3,  # Baixa variabilidade para consistência
-            response_format={"type": "json_object"}  # Força saída JSON
+        resposta_json = await servico.chat(
+            _montar_mensagens_lote([(id_email, textos[i]) for id_email, i in ids.items()]),
+            **{**TRIAGEM_PARAMS, "max_tokens": max_tokens}
         )
+        validos = _interpretar_resposta_lote(resposta_json, ids)
+    except Exception as e:
+        return {}, e
+    return {ids[id_email]: resultado for id_email, resultado in validos.items()}, None
 
-        # Extrair e parsear a resposta JSON
-        resposta_json = response.choices[0].message.content.strip()
-        resultado = json.loads(resposta_json)
 
-        # Validar se as chaves esperadas estão presentes
-        if "categoria" not in resultado or "resposta_sugerida" not in resultado:
-            raise ValueError("Resposta da IA não contém as chaves obrigatórias.")
+async def processar_triagem_lote_async(textos, orcamento_tokens=LOTE_ORCAMENTO_TOKENS, max_emails=LOTE_MAX_EMAILS):
+    """
+    Versão assíncrona de processar_triagem_lote. Os pacotes de cada rodada são
+    enviados em paralelo (respeitando o limite de concorrência do serviço).
+    """
+    if not os.getenv('OPENAI_API_KEY'):
+        return [_chave_nao_configurada() for _ in textos]
 
-        return resultado
+    servico = get_llm_service()
+    resultados = [None] * len(textos)
+    erros = {}
+    pendentes = [i for i, texto in enumerate(textos) if texto and texto.strip()]
+    for i in set(range(len(textos))) - set(pendentes):
+        resultados[i] = {"erro": "E-mail vazio"}
 
-    except openai.APIError as e:
-        return {
-            "erro": f"Erro na API OpenAI: {str(e)}"
-        }
-    except json.JSONDecodeError as e:
-        return {
-            "erro": f"Erro ao parsear resposta JSON: {str(e)}"
-        }
-    except Exception as e:
-        return {
-            "erro": f"Erro inesperado: {str(e)}"
-        }
+    for _ in range(1 + LOTE_RETENTATIVAS):
+        if not pendentes:
+            break
+        pacotes = empacotar([textos[i] for i in pendentes], orcamento_tokens, max_emails)
+        rodada = await asyncio.gather(*[
+            _triar_pacote(servico, textos, [pendentes[j] for j in pacote]) for pacote in pacotes
+        ])
+        for pacote, (validos, erro) in zip(pacotes, rodada):
+            for j in pacote:
+                i = pendentes[j]
+                if i in validos:
+                    resultados[i] = validos[i]
+                elif erro is not None:
+                    erros[i] = _erro(erro)
+                else:
+                    erros[i] = {"erro": "Resposta da IA sem um resultado válido para este e-mail."}
+        # Apenas os itens que falharam são reenviados, em pacotes novos
+        pendentes = [i for i in pendentes if resultados[i] is None]
+
+    for i in pendentes:
+        resultados[i] = erros[i]
+    return resultados
+
+
+def processar_triagem_lote(textos, orcamento_tokens=LOTE_ORCAMENTO_TOKENS, max_emails=LOTE_MAX_EMAILS):
+    """
+    Triagem de vários e-mails com poucas chamadas à OpenAI.
+
+    Os e-mails são agrupados em pacotes que cabem em orcamento_tokens (a
+    mensagem do sistema é enviada uma vez por pacote, e não uma vez por e-mail)
+    e a IA retorna uma lista de resultados identificados pelo id de cada e-mail.
+    Cada item é validado; os que faltam ou vêm inválidos são reenviados em novos
+    pacotes, até LOTE_RETENTATIVAS vezes.
+
+    Args:
+        textos (list): Conteúdo dos e-mails.
+        orcamento_tokens (int): Tokens de entrada estimados por chamada.
+        max_emails (int): Máximo de e-mails por chamada.
+
+    Returns:
+        list: Um dicionário por e-mail, na mesma ordem, com 'categoria' e
+        'resposta_sugerida' ou 'erro'.
+    """
+    if not os.getenv('OPENAI_API_KEY'):
+        return [_chave_nao_configurada() for _ in textos]
+    return get_llm_service().run(processar_triagem_lote_async(textos, orcamento_tokens, max_emails))